@@ -0,0 +1,208 @@
+"""
+Benchmark de los algoritmos de asignación sobre puntos sintéticos de Trujillo.
+
+Uso:
+    python -m benchmarks.ejecutar --tamanos 1000 10000 --grupos 5 30 --salida bench.json
+    python -m benchmarks.ejecutar --comparar bench_anterior.json bench.json
+
+Por cada (algoritmo, n, k) registra tiempo, memoria pico (tracemalloc) y
+calidad (balance, dispersión, solapamiento) en un JSON comparable entre versiones.
+El avance (una fila por medición) se imprime en stderr.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import sklearn
+
+from benchmarks.generador import generar_puntos
+from utils.metricas import MetricasPlan
+from views.algorithms import (
+    asignar_balanceado_preciso, asignar_capacitado, asignar_por_kmeans, asignar_por_zona,
+    asignar_sweep, capacidades_por_dia, distribucion_por_proximidad
+)
+from views.prueba import asignar_por_kmeans_evolutivo
+
+# 👉 nombre -> función (df, k) -> etiquetas de día
+ALGORITMOS = {
+    "asignar_por_zona": lambda df, k: asignar_por_zona(df, k),
+    "distribucion_por_proximidad": lambda df, k: distribucion_por_proximidad(df, k),
+    "asignar_balanceado_preciso": lambda df, k: asignar_balanceado_preciso(df, k),
+    "asignar_capacitado": lambda df, k: asignar_capacitado(df, k),
+    "asignar_sweep": lambda df, k: asignar_sweep(df, k),
+    "asignar_por_kmeans": lambda df, k: asignar_por_kmeans(df, list(capacidades_por_dia(len(df), k))),
+    "asignar_por_kmeans_evolutivo": lambda df, k: asignar_por_kmeans_evolutivo(
+        df, list(capacidades_por_dia(len(df), k)), random_state=42
+    )[0],
+}
+
+TAMANOS = [1_000, 10_000, 100_000, 500_000]
+GRUPOS = [5, 30, 200]
+
+
+def calidad(xy, etiquetas, k):
+    """
+    Métricas de calidad de una asignación (distancias en metros).
+    - balance_max: mayor desvío relativo frente a n/k.
+    - balance_cv: coeficiente de variación de los tamaños.
+    - dispersion_m: distancia media de cada punto al centroide de su grupo.
+    - solapamiento_m: suma de solapes de los rangos este-oeste entre grupos consecutivos.
+    """
+    asignados = etiquetas >= 0
+    xy, etiquetas = xy[asignados], etiquetas[asignados].astype(np.int64)
+    conteos = np.bincount(etiquetas, minlength=k)
+    esperado = len(etiquetas) / k
+
+    con_puntos = conteos > 0
+    centroides = np.zeros((k, 2))
+    for eje in range(2):
+        centroides[con_puntos, eje] = (
+            np.bincount(etiquetas, weights=xy[:, eje], minlength=k)[con_puntos] / conteos[con_puntos]
+        )
+    dispersion = np.hypot(*(xy - centroides[etiquetas]).T).mean() if len(xy) else 0.0
+
+    x_min = np.full(k, np.inf)
+    x_max = np.full(k, -np.inf)
+    np.minimum.at(x_min, etiquetas, xy[:, 0])
+    np.maximum.at(x_max, etiquetas, xy[:, 0])
+    orden = np.argsort(x_min[con_puntos], kind="stable")
+    izq, der = x_min[con_puntos][orden], x_max[con_puntos][orden]
+    solapamiento = np.clip(der[:-1] - izq[1:], 0.0, None).sum()
+
+    return {
+        "sin_asignar": int((~asignados).sum()),
+        "balance_max": round(float(np.abs(conteos - esperado).max() / esperado), 4) if esperado else 0.0,
+        "balance_cv": round(float(conteos.std() / conteos.mean()), 4) if conteos.mean() else 0.0,
+        "dispersion_m": round(float(dispersion), 1),
+        "solapamiento_m": round(float(solapamiento), 1),
+    }
+
+
+def medir(nombre, df, k, memoria=True):
+    """Ejecuta un algoritmo: tiempo de pared, memoria pico (en una segunda corrida) y calidad."""
+    funcion = ALGORITMOS[nombre]
+    inicio = time.perf_counter()
+    resultado = funcion(df, k)
+    tiempo = time.perf_counter() - inicio
+
+    pico_mb = None
+    if memoria:
+        # tracemalloc enlentece el código Python: la memoria se mide aparte del tiempo
+        tracemalloc.start()
+        funcion(df, k)
+        pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    xy = resultado[["X_m", "Y_m"]].to_numpy(dtype=float)
+    etiquetas = resultado["Dia"].to_numpy()
+    terminos = MetricasPlan(
+        resultado[["Latitud", "Longitud"]].to_numpy(dtype=float), etiquetas,
+        capacidades_por_dia(len(resultado), k), xy=xy
+    ).terminos()
+    return {
+        "algoritmo": nombre, "n": len(df), "k": k,
+        "tiempo_s": round(tiempo, 4),
+        "memoria_pico_mb": None if pico_mb is None else round(pico_mb, 2),
+        **calidad(xy, etiquetas, k),
+        "costo": round(terminos["costo"], 4),
+        "ruta_estimada_m": round(terminos["ruta_estimada_m"], 1),
+    }
+
+
+def _version_codigo():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def ejecutar(tamanos=TAMANOS, grupos=GRUPOS, algoritmos=None, semilla=0, memoria=True):
+    """Corre la grilla (algoritmo × n × k) y devuelve el informe como dict."""
+    algoritmos = algoritmos or list(ALGORITMOS)
+    resultados = []
+    for n in tamanos:
+        df = generar_puntos(n, semilla=semilla)
+        for k in grupos:
+            if k >= n:
+                continue
+            for nombre in algoritmos:
+                try:
+                    fila = medir(nombre, df, k, memoria=memoria)
+                except Exception as e:
+                    fila = {"algoritmo": nombre, "n": n, "k": k, "error": repr(e)}
+                resultados.append(fila)
+                # 👉 Avance por stderr: stdout queda solo para el informe JSON
+                print(json.dumps(fila, ensure_ascii=False), file=sys.stderr, flush=True)
+
+    return {
+        "version": _version_codigo(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "plataforma": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "semilla": semilla,
+        "resultados": resultados,
+    }
+
+
+def comparar(previo, actual):
+    """
+    Filas (algoritmo, n, k) con la razón actual / previo de tiempo y memoria
+    (> 1 es una regresión).
+    """
+    clave = lambda r: (r["algoritmo"], r["n"], r["k"])
+    anteriores = {clave(r): r for r in previo["resultados"] if "error" not in r}
+    filas = []
+    for r in actual["resultados"]:
+        a = anteriores.get(clave(r))
+        if a is None or "error" in r:
+            continue
+        fila = {"algoritmo": r["algoritmo"], "n": r["n"], "k": r["k"],
+                "tiempo": round(r["tiempo_s"] / max(a["tiempo_s"], 1e-9), 3)}
+        if r.get("memoria_pico_mb") and a.get("memoria_pico_mb"):
+            fila["memoria"] = round(r["memoria_pico_mb"] / a["memoria_pico_mb"], 3)
+        filas.append(fila)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de algoritmos de asignación")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS)
+    parser.add_argument("--grupos", type=int, nargs="+", default=GRUPOS)
+    parser.add_argument("--algoritmos", nargs="+", choices=list(ALGORITMOS))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--sin-memoria", action="store_true", help="no medir memoria pico (más rápido)")
+    parser.add_argument("--salida", help="archivo JSON de salida (por defecto, stdout)")
+    parser.add_argument("--comparar", nargs=2, metavar=("PREVIO", "ACTUAL"),
+                        help="comparar dos informes JSON en lugar de ejecutar")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f:
+            previo = json.load(f)
+        with open(args.comparar[1], encoding="utf-8") as f:
+            actual = json.load(f)
+        print(json.dumps(comparar(previo, actual), ensure_ascii=False, indent=2))
+        return
+
+    informe = ejecutar(args.tamanos, args.grupos, args.algoritmos, args.semilla,
+                       memoria=not args.sin_memoria)
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from utils.distancias import agregar_plano, metros_por_grado
+
+# 👉 Centro de Trujillo (como los puntos de views/mapa_prueba.py)
+CENTRO_TRUJILLO = (-8.11, -79.03)
+
+
+def generar_puntos(n, n_barrios=None, semilla=0, centro=CENTRO_TRUJILLO,
+                   ancho_m=12_000, alto_m=10_000, fraccion_dispersa=0.05):
+    """
+    Puntos urbanos sintéticos y reproducibles: barrios densos de distinto tamaño
+    más una fracción de puntos dispersos por toda la ciudad.
+    - n: cantidad de puntos.
+    - n_barrios: cantidad de barrios (por defecto crece con n).
+    - semilla: misma semilla, mismos puntos.
+    - ancho_m / alto_m: extensión de la ciudad en metros.
+    Devuelve un DataFrame con CONTRATO, Latitud, Longitud y el plano X_m / Y_m.
+    """
+    rng = np.random.default_rng(semilla)
+    if n_barrios is None:
+        n_barrios = int(np.clip(np.sqrt(n) / 4, 8, 400))
+
+    n_dispersos = int(n * fraccion_dispersa)
+    n_barrio = n - n_dispersos
+
+    # Barrios: centros dentro de la ciudad, pesos y radios desiguales
+    centros = rng.uniform([-ancho_m / 2, -alto_m / 2], [ancho_m / 2, alto_m / 2], size=(n_barrios, 2))
+    pesos = rng.lognormal(0.0, 0.8, n_barrios)
+    radios = rng.uniform(150, 800, n_barrios)
+    barrio = rng.choice(n_barrios, size=n_barrio, p=pesos / pesos.sum())
+    xy_barrio = centros[barrio] + rng.normal(size=(n_barrio, 2)) * radios[barrio, None]
+
+    xy_disperso = rng.uniform([-ancho_m / 2, -alto_m / 2], [ancho_m / 2, alto_m / 2], size=(n_dispersos, 2))
+    xy = np.vstack([xy_barrio, xy_disperso])
+    xy = xy[rng.permutation(n)]
+
+    # Metros -> grados alrededor del centro
+    escala = metros_por_grado(centro)
+    df = pd.DataFrame({
+        "CONTRATO": np.arange(1, n + 1),
+        "Latitud": centro[0] + xy[:, 1] / escala[1],
+        "Longitud": centro[1] + xy[:, 0] / escala[0],
+    })
+    return agregar_plano(df)
@@ -20,6 +20,7 @@ class DiasController:
             "Ingrese número de días:",
             min_value=1,
             step=1,
+            key="n_dias",
             help="Número de grupos en que se dividirán los puntos."
         )
         return self.n_dias
@@ -1,11 +1,23 @@
 import streamlit as st
-import pandas as pd
-import io
+import os
 from models.points_model import PointsModel
 from views.map_view import render_colored_map
-from shapely.geometry import Point, Polygon
+from utils.exportar import (
+    FORMATOS, MIME_ZIP, exportar_plan, huella_plan, nombre_seguro, resumen_por, zip_por_grupo
+)
+from views.descargas import descarga_bajo_demanda
+from utils.seleccion import geometrias_dibujadas, seleccionar_puntos
 from controllers.dias_controller import DiasController
+from controllers.tecnico_controller import TecnicosController
 from views.prueba import asignar_por_kmeans_evolutivo
+from utils.cache_resultados import aplicar_con_memo
+from views.rutas import grupos_cambiados, invalidar_orden, secuenciar_grupos
+from views.metricas_view import mostrar_metricas, vista_previa_reasignacion
+from views.refinamiento import refinar_df
+from views.algorithms import capacidades_por_dia
+from views.replanificacion import replanificar_desde_plan
+from utils.columnas import columna_contrato
+from utils.ingesta import compactar, huella_contenido, leer_plan, reporte_memoria
 
 class PointsController:
     def __init__(self, df):
@@ -15,22 +27,114 @@ class PointsController:
             st.session_state["cambios_guardados"] = False
         if "algoritmo_aplicado" not in st.session_state:
             st.session_state["algoritmo_aplicado"] = False
+        self.df_cargado = df
         self.model = PointsModel(st.session_state["df"])
     
     def run(self):
         st.title("Planificación por Días GR")
         self.run_por_dias()
+        self.run_tecnicos()
+        self.run_reporte_memoria()
+
+    def _descartar_tecnicos(self):
+        """
+        Los técnicos se asignan dentro de cada día: si Dia se recalcula o se edita,
+        se quita la columna Tecnico y cada día vuelve a asignar sus técnicos.
+        """
+        df = st.session_state["df"]
+        if "Tecnico" in df.columns:
+            df = df.copy(deep=False)
+            del df["Tecnico"]
+            st.session_state["df"] = df
+        for clave in [c for c in st.session_state if str(c).startswith("algoritmo_tecnicos_aplicado_")]:
+            del st.session_state[clave]
+
+    def run_reporte_memoria(self):
+        """Memoria que ocupa el plan de esta sesión, columna por columna."""
+        with st.expander("🧮 Memoria del plan por columna"):
+            if st.checkbox("Calcular memoria por columna", key="calcular_reporte_memoria"):
+                reporte = reporte_memoria(st.session_state["df"])
+                st.dataframe(reporte.round({"MB": 3, "Porcentaje": 1}), use_container_width=True)
+
+    def run_tecnicos(self):
+        """Asignación de técnicos sobre el plan por días: un día o todos a la vez."""
+        df = st.session_state["df"]
+        if "Dia" not in df.columns or not st.session_state["algoritmo_aplicado"]:
+            return
+
+        st.header("👷 Técnicos")
+        modo = st.radio(
+            "Asignación de técnicos:", ["No asignar", "Un día", "Todos los días"],
+            horizontal=True, key="modo_tecnicos"
+        )
+        if modo == "Un día":
+            dia = st.selectbox("Día:", sorted(df["Dia"].dropna().unique()), key="dia_tecnicos")
+            TecnicosController(df, dia).run()
+        elif modo == "Todos los días":
+            TecnicosController(df).run()
         
+    def run_plan_previo(self):
+        """
+        Modo incremental: con un plan ya exportado (distribucion_completa) los contratos
+        que siguen conservan su Dia/Tecnico, incluidas las ediciones manuales; solo se
+        ubican los nuevos y se reequilibran los días que perdieron o ganaron puntos.
+        """
+        with st.expander("♻️ Continuar desde un plan previo"):
+            archivo = st.file_uploader(
+                "Plan previo (distribucion_completa en xlsx, csv o parquet):",
+                type=["xlsx", "csv", "parquet"], key="plan_previo"
+            )
+        if archivo is None:
+            return
+
+        huella = (
+            huella_contenido(archivo.getvalue()),
+            huella_plan(self.df_cargado, [columna_contrato(self.df_cargado)])
+        )
+        if st.session_state.get("plan_previo_huella") != huella:
+            try:
+                df, resumen = replanificar_desde_plan(self.df_cargado, leer_plan(archivo))
+            except ValueError as e:
+                st.error(str(e))
+                return
+
+            # 👉 El plan cruzado es la asignación vigente: no se vuelve a calcular
+            n_dias = int(df["Dia"].nunique())
+            st.session_state["df"] = compactar(df)
+            st.session_state["n_dias"] = n_dias
+            st.session_state["n_dias_anterior"] = n_dias
+            st.session_state["algoritmo_aplicado"] = True
+            st.session_state["conservar_plan"] = True
+            if "Tecnico" in df.columns:
+                for dia in df["Dia"].unique():
+                    st.session_state[f"algoritmo_tecnicos_aplicado_{dia}"] = True
+            st.session_state["plan_previo_huella"] = huella
+            st.session_state["plan_previo_resumen"] = resumen
+
+        resumen = st.session_state["plan_previo_resumen"]
+        st.info(
+            f"♻️ Plan previo: {resumen['conservados']} contratos conservados, {resumen['nuevos']} nuevos, "
+            f"{resumen['eliminados']} eliminados y {resumen['reubicados']} reubicados para reequilibrar."
+        )
+
     def run_por_dias(self):
+        self.run_plan_previo()
         dias_ctrl = DiasController(st.session_state["df"])
         n_dias = dias_ctrl.solicitar_numero_dias()
 
         if "n_dias_anterior" not in st.session_state or st.session_state["n_dias_anterior"] != n_dias:
+            # 👉 Con un plan previo, k±1 parte o une días en lugar de recalcular todo
+            st.session_state["arranque_tibio"] = (
+                "n_dias_anterior" in st.session_state and "Dia" in st.session_state["df"].columns
+            )
             st.session_state["algoritmo_aplicado"] = False
             st.session_state["n_dias_anterior"] = n_dias
+            self._descartar_tecnicos()
 
         if n_dias > 0:
             cantidades = dias_ctrl.asignar_puntos_por_dia()
+            # 👉 Objetivo por día de los algoritmos (el sobrante va a los primeros días)
+            objetivos = capacidades_por_dia(len(st.session_state["df"]), n_dias)
 
             if cantidades is not None:
                 st.success("Distribución de puntos validada correctamente ✅")
@@ -41,27 +145,68 @@ class PointsController:
                     key="algoritmo_selector"
                 )
 
-                if "algoritmo_anterior" not in st.session_state or st.session_state["algoritmo_anterior"] != algoritmo:
+                # 👉 Opciones de ejecución en paralelo del híbrido evolutivo
+                n_workers, n_islas = 1, 1
+                if algoritmo == "kms-evolutivo":
+                    with st.expander("⚙️ Ejecución en paralelo"):
+                        n_workers = st.number_input(
+                            "Procesos para evaluar la población:",
+                            min_value=1, max_value=os.cpu_count() or 1, value=1, step=1,
+                            key="evolutivo_workers"
+                        )
+                        n_islas = st.number_input(
+                            "Islas (subpoblaciones que intercambian élites):",
+                            min_value=1, value=1, step=1, key="evolutivo_islas"
+                        )
+
+                # 👉 Búsqueda local opcional después del algoritmo (lleva cada día a su objetivo)
+                refinar = st.checkbox(
+                    "🔧 Refinar asignación (intercambios entre días vecinos)", key="refinar_asignacion"
+                )
+                tiempo_refinado = 2.0
+                if refinar:
+                    tiempo_refinado = st.number_input(
+                        "Tiempo máximo de refinamiento (segundos):",
+                        min_value=0.5, value=2.0, step=0.5, key="tiempo_refinado"
+                    )
+
+                configuracion = (algoritmo, n_workers, n_islas, refinar, tiempo_refinado)
+                if st.session_state.pop("conservar_plan", False):
+                    st.session_state["algoritmo_anterior"] = configuracion
+                elif "algoritmo_anterior" not in st.session_state or st.session_state["algoritmo_anterior"] != configuracion:
                     st.session_state["algoritmo_aplicado"] = False
-                    st.session_state["algoritmo_anterior"] = algoritmo
+                    st.session_state["algoritmo_anterior"] = configuracion
+                    self._descartar_tecnicos()
 
                 if not st.session_state["algoritmo_aplicado"]:
-                    from views.algorithms import aplicar_algoritmo
+                    from views.algorithms import ALGORITMOS_ARRANQUE, aplicar_algoritmo
+
+                    # 👉 El arranque tibio vale solo para esta ejecución y solo con centroides
+                    arranque_tibio = st.session_state.pop("arranque_tibio", False)
 
                     if algoritmo in ["Por zona","Capacitado","Sweep"]:
+                        previo = None
+                        if arranque_tibio and algoritmo in ALGORITMOS_ARRANQUE:
+                            previo = st.session_state["df"]["Dia"]
                         st.session_state["df"] = aplicar_algoritmo(
-                            st.session_state["df"], algoritmo, n_dias, columna="Dia"
+                            st.session_state["df"], algoritmo, n_dias, columna="Dia", previo=previo
                         )
                         st.success(f"✅ Asignación aplicada con algoritmo {algoritmo}")
                         st.session_state["algoritmo_aplicado"] = True
 
                     elif algoritmo == "kms-evolutivo":
-                        df_opt, info = asignar_por_kmeans_evolutivo(
-                            st.session_state["df"], cantidades,
-                            n_generations=50, population_size=20,
-                            alpha=1.0, beta=3.0, gamma=2.0
+                        params_evolutivo = dict(
+                            cantidades=objetivos.tolist(), n_generations=50, population_size=20,
+                            alpha=1.0, beta=3.0, gamma=2.0, n_islas=n_islas
+                        )
+                        df_opt, info = aplicar_con_memo(
+                            st.session_state["df"], algoritmo, n_dias,
+                            lambda d: asignar_por_kmeans_evolutivo(
+                                d, n_workers=n_workers, random_state=42, **params_evolutivo
+                            ),
+                            params=params_evolutivo, seed=42
                         )
-                        st.session_state["df"] = df_opt
+                        st.session_state["df"] = invalidar_orden(df_opt)
                         st.success("✅ Asignación híbrida KMeans + Evolutivo aplicada")
                         st.session_state["algoritmo_aplicado"] = True
 
@@ -79,11 +224,28 @@ class PointsController:
                         ax.set_ylabel("Costo")
                         st.pyplot(fig)
 
+                    if refinar and st.session_state["algoritmo_aplicado"]:
+                        # Mismos objetivos que los algoritmos: los traslados corrigen desbalances
+                        st.session_state["df"] = invalidar_orden(refinar_df(
+                            st.session_state["df"], "Dia", objetivos, tiempo_max=tiempo_refinado
+                        ))
+                        st.success("✅ Asignación refinada por búsqueda local")
+
+                # 🧭 Orden de visita: solo se recalculan los días cuyos puntos cambiaron
+                if "Dia" in st.session_state["df"].columns and st.checkbox(
+                    "🧭 Calcular orden de visita por día", key="calcular_orden_dias"
+                ):
+                    previo = st.session_state.get("_dias_secuenciados")
+                    grupos = grupos_cambiados(st.session_state["df"], "Dia", previo)
+                    if grupos is None or grupos:
+                        st.session_state["df"] = secuenciar_grupos(st.session_state["df"], "Dia", grupos=grupos)
+                        st.session_state["_dias_secuenciados"] = st.session_state["df"]["Dia"].copy()
+
                 dias_ctrl.data = st.session_state["df"]
 
-                # 🗺️ Mapa automático
+                # 🗺️ Mapa automático (el mismo componente sirve para la edición manual)
                 st.subheader("🗺️ Distribución automática por días")
-                render_colored_map(st.session_state["df"], color_by="Dia", key="map_auto", editable=False)
+                output = render_colored_map(st.session_state["df"], color_by="Dia", key="map_editable", editable=True)
 
                 # 📊 Resumen por día
                 if "Dia" in st.session_state["df"].columns:
@@ -95,40 +257,20 @@ class PointsController:
                         .reset_index()
                     )
                     st.table(resumen)
+
+                    # 📐 Costo y ruta estimada del plan actual
+                    metricas, categorias = mostrar_metricas(st.session_state["df"], "Dia", objetivos)
                 else:
                     st.warning("⚠️ Aún no se ha asignado ningún día a los puntos.")
 
-                # ✏️ Mapa editable
+                # ✏️ Edición manual en el mapa
                 st.subheader("✏️ Edición manual en el mapa")
-                output = render_colored_map(st.session_state["df"], color_by="Dia", key="map_editable", editable=True)
-
-                # 👉 Procesar geometría si el usuario dibuja
-                geom = None
-                if output and output.get("last_active_drawing"):
-                    geom = output["last_active_drawing"]["geometry"]
-                else:
-                    dibujos = output.get("all_drawings") or []
-                    for d in reversed(dibujos):
-                        if d.get("geometry", {}).get("type") in ("Polygon", "MultiPolygon"):
-                            geom = d["geometry"]
-                            break
-
-                if geom:
-                    # ✅ Manejo robusto de Polygon y MultiPolygon
-                    if geom["type"] == "Polygon":
-                        coords_poly = geom["coordinates"][0]
-                    elif geom["type"] == "MultiPolygon":
-                        coords_poly = geom["coordinates"][0][0]
-                    else:
-                        coords_poly = []
+                st.caption("Dibuje un polígono en el mapa de arriba para seleccionar puntos y reasignarlos.")
 
+                # 👉 Procesar geometría si el usuario dibuja (todos los polígonos, con huecos y MultiPolygon)
+                if geometrias_dibujadas(output):
                     try:
-                        coords_poly = [(float(x), float(y)) for x, y in coords_poly]
-                        polygon = Polygon(coords_poly)
-
-                        seleccionados = st.session_state["df"][st.session_state["df"].apply(
-                            lambda r: polygon.contains(Point(float(r['Longitud']), float(r['Latitud']))), axis=1
-                        )]
+                        seleccionados = seleccionar_puntos(st.session_state["df"], output)
 
                         st.toast(f"✅ Polígono cerrado. Puntos dentro: {len(seleccionados)}")
                         st.success(f"Puntos seleccionados: {len(seleccionados)}")
@@ -139,9 +281,18 @@ class PointsController:
                                 "Asignar estos puntos al día (puede ser número o nombre personalizado):",
                                 key=f"dia_manual_{len(seleccionados)}"
                             )
+                            if "Dia" in st.session_state["df"].columns:
+                                vista_previa_reasignacion(
+                                    st.session_state["df"], metricas, categorias, seleccionados.index, dia_manual
+                                )
 
                             if st.button("💾 Guardar cambios en asignación", key=f"guardar_{len(seleccionados)}"):
-                                st.session_state["df"].loc[seleccionados.index, "Dia"] = dia_manual
+                                # 👉 Los días que pierden o ganan puntos quedan sin orden de visita
+                                df = st.session_state["df"]
+                                if "Orden" in df.columns:
+                                    invalidar_orden(df, df["Dia"].isin(set(seleccionados["Dia"]) | {dia_manual}))
+                                df.loc[seleccionados.index, "Dia"] = dia_manual
+                                self._descartar_tecnicos()
                                 dias_ctrl.data = st.session_state["df"]
                                 dias_ctrl.mostrar_resumen_por_dia()
                                 st.session_state["cambios_guardados"] = True
@@ -158,52 +309,35 @@ class PointsController:
 
                 # 👉 Botón de descarga
                 if "Dia" in st.session_state["df"].columns:
-                    resumen = (
-                        st.session_state["df"]
-                        .groupby("Dia")
-                        .agg(Cantidad_puntos=("Dia", "count"))
-                        .reset_index()
-                    )
+                    datos = dias_ctrl.data
+                    huella = huella_plan(datos, ["Dia"])
 
-                    output_excel_completo = io.BytesIO()
-                    with pd.ExcelWriter(output_excel_completo, engine="openpyxl") as writer:
-                        if "Código de identificación interna del predio" in dias_ctrl.data.columns:
-                            dias_ctrl.data = dias_ctrl.data.astype({"Código de identificación interna del predio": str})
+                    formato = st.selectbox("Formato de descarga:", list(FORMATOS), key="formato_descarga")
+                    extension, mime = FORMATOS[formato]
 
-                        dias_ctrl.data.to_excel(writer, index=False, sheet_name="Distribucion_Final")
-                        resumen.to_excel(writer, index=False, sheet_name="Resumen")
-                
-                    st.download_button(
-                        label="📥 Descargar distribución completa (todos los días + resumen)",
-                        data=output_excel_completo.getvalue(),
-                        file_name="distribucion_completa.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    descarga_bajo_demanda(
+                        "📥 Descargar distribución completa (todos los días + resumen)", f"completa_{extension}",
+                        lambda: exportar_plan(
+                            datos, extension, "Dia", "Distribucion_Final",
+                            hojas_extra={"Resumen": resumen_por(datos, "Dia")}
+                        ),
+                        f"distribucion_completa.{extension}", mime, huella
                     )
-                # 👉 Botón de descarga por día
-                if "Dia" in st.session_state["df"].columns:
-                    dias_unicos = sorted(st.session_state["df"]["Dia"].dropna().unique())
-                    
+
+                    # 👉 Descarga por día: un zip con todos los días o un día puntual
                     st.subheader("📥 Descarga por día")
-                    for dia in dias_unicos:
-                        subset = st.session_state["df"][st.session_state["df"]["Dia"] == dia]
-
-                        output_excel_dia = io.BytesIO()
-                        safe_dia = str(dia).replace(" ", "_") # evitar espacios en nombres de archivo
-                        with pd.ExcelWriter(output_excel_dia, engine="openpyxl") as writer:
-                            if "Código de identificación interna del predio" in subset.columns:
-                                subset = subset.astype({"Código de identificación interna del predio": str})
-                            
-                            subset.to_excel(writer, index=False, sheet_name=f"Dia_{safe_dia}")
-                            
-                            # Convertir la columna de identificación a texto antes de exportar
-                            subset.astype({"Código de identificación interna del predio": str}).to_excel(
-                                writer, index=False, sheet_name=f"Dia_{safe_dia}"
-                            )
-                            
-                        st.download_button(
-                            label=f"📥 Descargar distribución del día {dia}",
-                            data=output_excel_dia.getvalue(),
-                            file_name=f"distribucion_dia_{dia}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    descarga_bajo_demanda(
+                        f"📥 Descargar todos los días (zip con un archivo .{extension} por día)", f"zip_dias_{extension}",
+                        lambda: zip_por_grupo(datos, "Dia", "distribucion_dia", extension=extension),
+                        f"distribucion_por_dia_{extension}.zip", MIME_ZIP, huella
+                    )
 
+                    dias_unicos = sorted(datos["Dia"].dropna().unique())
+                    dia = st.selectbox("Día a descargar por separado:", dias_unicos, key="dia_descarga")
+                    descarga_bajo_demanda(
+                        f"📥 Descargar distribución del día {dia}", f"dia_{dia}_{extension}",
+                        lambda: exportar_plan(
+                            datos[datos["Dia"] == dia], extension, "Dia", f"Dia_{nombre_seguro(dia)}"
+                        ),
+                        f"distribucion_dia_{nombre_seguro(dia)}.{extension}", mime, huella
+                    )
@@ -1,17 +1,30 @@
+import os
 import streamlit as st
 import pandas as pd
-import io
-from shapely.geometry import Point, Polygon
+from utils.seleccion import seleccionar_puntos
+from utils.exportar import (
+    FORMATOS, MIME_XLSX, MIME_ZIP, exportar_plan, huella_plan, libro_excel, nombre_seguro,
+    resumen_por, zip_por_grupo
+)
+from views.descargas import descarga_bajo_demanda
 from views.map_view import render_colored_map
-from views.algorithms import aplicar_algoritmo   # ✅ usar envoltorio genérico
+from views.algorithms import aplicar_algoritmo, asignar_tecnicos_por_dia   # ✅ usar envoltorio genérico
+from views.rutas import grupos_cambiados, invalidar_orden, secuenciar_grupos
+from views.metricas_view import mostrar_metricas, vista_previa_reasignacion
+
+ALGORITMOS_TECNICOS = ["Por zona", "Por proximidad", "Balanceado Preciso", "Capacitado", "Sweep"]
 
 class TecnicosController:
-    def __init__(self, df, dia_seleccionado):
-        # Filtrar solo los puntos del día seleccionado
-        self.df = df[df["Dia"] == dia_seleccionado].copy()
+    def __init__(self, df, dia_seleccionado=None):
+        # Filtrar solo los puntos del día seleccionado (None = todos los días)
+        self.df = df[df["Dia"] == dia_seleccionado].copy() if dia_seleccionado is not None else df
         self.dia = dia_seleccionado
 
     def run(self):
+        if self.dia is None:
+            self.run_todos_los_dias()
+            return
+
         st.title(f"👷 Asignación de Técnicos para el Día {self.dia}")
 
         # Solicitar número de técnicos
@@ -30,29 +43,45 @@ class TecnicosController:
             # Selector de algoritmo
             algoritmo = st.selectbox(
                 "Seleccione algoritmo de asignación entre técnicos",
-                [
-                    "Por zona",
-                    "Por proximidad",
-                    "Balanceado Preciso",
-                    "Capacitado",
-                    "Sweep"
-                ],
+                ALGORITMOS_TECNICOS,
                 key=f"algoritmo_tecnicos_{self.dia}"
             )
 
-            # 👉 Aplicar algoritmo solo la primera vez
+            # 👉 Si cambió el número de técnicos, se reanuda desde la asignación actual
+            previo = None
+            clave_anterior = f"n_tecnicos_anterior_{self.dia}"
+            anterior = st.session_state.get(clave_anterior)
+            st.session_state[clave_anterior] = n_tecnicos
+            if anterior is not None and anterior != n_tecnicos and "Tecnico" in st.session_state["df"].columns:
+                previo = st.session_state["df"].loc[self.df.index, "Tecnico"]
+                if previo.notna().all():
+                    st.session_state[f"algoritmo_tecnicos_aplicado_{self.dia}"] = False
+                else:
+                    previo = None
+
+            # 👉 Aplicar algoritmo solo la primera vez (o al cambiar el número de técnicos)
             if not st.session_state[f"algoritmo_tecnicos_aplicado_{self.dia}"]:
-                self.df = aplicar_algoritmo(self.df, algoritmo, n_tecnicos, columna="Tecnico")
+                self.df = aplicar_algoritmo(self.df, algoritmo, n_tecnicos, columna="Tecnico", previo=previo)
+                invalidar_orden(st.session_state["df"], self.df.index)
                 st.session_state["df"].loc[self.df.index, "Tecnico"] = self.df["Tecnico"]
                 st.session_state[f"algoritmo_tecnicos_aplicado_{self.dia}"] = True
             else:
                 # 👉 Ya se aplicó el algoritmo, refrescar desde el global
                 self.df = st.session_state["df"][st.session_state["df"]["Dia"] == self.dia].copy()
 
-            # 👉 Mostrar mapa automático (algoritmo + ediciones)
+            # 🧭 Orden de visita por técnico (solo técnicos cuyos puntos cambiaron)
+            if st.checkbox("🧭 Calcular orden de visita por técnico", key=f"calcular_orden_tecnicos_{self.dia}"):
+                clave_previo = f"_tecnicos_secuenciados_{self.dia}"
+                grupos = grupos_cambiados(self.df, "Tecnico", st.session_state.get(clave_previo))
+                if grupos is None or grupos:
+                    self.df = secuenciar_grupos(self.df, "Tecnico", grupos=grupos)
+                    st.session_state["df"].loc[self.df.index, "Orden"] = self.df["Orden"]
+                    st.session_state[clave_previo] = self.df["Tecnico"].copy()
+
+            # 👉 Mostrar mapa automático (algoritmo + ediciones); también sirve para dibujar
             st.subheader("🗺️ Distribución por técnicos (algoritmo + ediciones)")
             st.info(f"Algoritmo aplicado: {algoritmo}")
-            render_colored_map(self.df, color_by="Tecnico", key=f"map_tecnicos_{self.dia}")
+            output = render_colored_map(self.df, color_by="Tecnico", key=f"map_tecnicos_{self.dia}", editable=True)
 
             # 👉 Resumen inicial
             resumen = (
@@ -62,40 +91,36 @@ class TecnicosController:
             )
             st.subheader("📊 Resumen por técnico")
             st.table(resumen)
-
-            # 👉 Exportar resumen
-            output_resumen = io.BytesIO()
-            with pd.ExcelWriter(output_resumen, engine="openpyxl") as writer:
-                resumen.to_excel(writer, index=False, sheet_name="Resumen_Tecnicos")
-            st.download_button(
-                label="📥 Descargar resumen por técnico en Excel",
-                data=output_resumen.getvalue(),
-                file_name=f"resumen_tecnicos_dia_{self.dia}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            metricas, categorias = mostrar_metricas(self.df, "Tecnico", titulo="📐 Métricas por técnico")
+
+            # 👉 Exportaciones: se generan solo cuando se piden
+            huella = huella_plan(self.df, ["Tecnico"])
+            descarga_bajo_demanda(
+                "📥 Descargar resumen por técnico en Excel", f"resumen_tecnicos_{self.dia}",
+                lambda: libro_excel({"Resumen_Tecnicos": resumen}),
+                f"resumen_tecnicos_dia_{self.dia}.xlsx", MIME_XLSX, huella
             )
 
             # 👉 Exportar todos los puntos del día con asignación por técnico
-            output_excel_tecnicos = io.BytesIO()
-            with pd.ExcelWriter(output_excel_tecnicos, engine="openpyxl") as writer:
-                self.df.to_excel(writer, index=False, sheet_name="Asignacion_Tecnicos")
-            st.download_button(
-                label="📥 Descargar puntos asignados por técnico",
-                data=output_excel_tecnicos.getvalue(),
-                file_name=f"puntos_tecnicos_dia_{self.dia}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            descarga_bajo_demanda(
+                "📥 Descargar puntos asignados por técnico", f"puntos_tecnicos_{self.dia}",
+                lambda: libro_excel({"Asignacion_Tecnicos": self.df}),
+                f"puntos_tecnicos_dia_{self.dia}.xlsx", MIME_XLSX, huella
+            )
+
+            # 👉 Un zip con un Excel por técnico
+            descarga_bajo_demanda(
+                "📥 Descargar un Excel por técnico (zip)", f"zip_tecnicos_{self.dia}",
+                lambda: zip_por_grupo(self.df, "Tecnico", f"dia_{nombre_seguro(self.dia)}_tecnico"),
+                f"tecnicos_dia_{nombre_seguro(self.dia)}.zip", MIME_ZIP, huella
             )
 
             # 👉 Edición manual en mapa
             st.subheader("✏️ Edición manual por técnico")
-            output = render_colored_map(self.df, color_by="Tecnico", key=f"map_edit_tecnicos_{self.dia}")
-
-            if output and output.get("last_active_drawing"):
-                coords_poly = output["last_active_drawing"]["geometry"]["coordinates"][0]
-                polygon = Polygon(coords_poly)
+            st.caption("Dibuje un polígono en el mapa de distribución por técnicos para reasignar puntos.")
 
-                seleccionados = self.df[self.df.apply(
-                    lambda r: polygon.contains(Point(r['Longitud'], r['Latitud'])), axis=1
-                )]
+            seleccionados = seleccionar_puntos(self.df, output)
+            if seleccionados is not None:
 
                 st.success(f"Puntos seleccionados: {len(seleccionados)}")
                 st.write(seleccionados)
@@ -106,10 +131,15 @@ class TecnicosController:
                         min_value=0, max_value=n_tecnicos-1, step=1,
                         key=f"tecnico_manual_{len(seleccionados)}"
                     )
+                    vista_previa_reasignacion(self.df, metricas, categorias, seleccionados.index, int(tecnico_manual))
 
                     if st.button("💾 Guardar cambios en asignación", key=f"guardar_tecnicos_{len(seleccionados)}"):
                         # 👉 Guardar cambios en el DataFrame global
-                        st.session_state["df"].loc[seleccionados.index, "Tecnico"] = int(tecnico_manual)
+                        # 👉 Los técnicos del día que pierden o ganan puntos quedan sin orden de visita
+                        df = st.session_state["df"]
+                        tocados = set(seleccionados["Tecnico"]) | {int(tecnico_manual)}
+                        invalidar_orden(df, (df["Dia"] == self.dia) & df["Tecnico"].isin(tocados))
+                        df.loc[seleccionados.index, "Tecnico"] = int(tecnico_manual)
 
                         # 👉 Refrescar la copia
                         self.df = st.session_state["df"][st.session_state["df"]["Dia"] == self.dia].copy()
@@ -134,22 +164,82 @@ class TecnicosController:
             render_colored_map(st.session_state["df"], color_by="Tecnico", key=f"map_final_tecnicos_{self.dia}")
 
             # 👉 Botón de descarga de la distribución final por técnicos (todos los puntos del día)
-            output_excel_final = io.BytesIO()
-            with pd.ExcelWriter(output_excel_final, engine="openpyxl") as writer:
-                # Hoja con todos los puntos del día y su técnico asignado
-                self.df.to_excel(writer, index=False, sheet_name="Distribucion_Final_Tecnicos")
-
-                # Hoja con resumen por técnico
-                resumen_final = (
-                    self.df.groupby("Tecnico")
-                    .agg(Cantidad_puntos=("Tecnico", "count"))
-                    .reset_index()
-                )
-                resumen_final.to_excel(writer, index=False, sheet_name="Resumen_Tecnicos")
-
-            st.download_button(
-                label="📥 Descargar distribución final por técnicos",
-                data=output_excel_final.getvalue(),
-                file_name=f"distribucion_final_tecnicos_dia_{self.dia}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            formato = st.selectbox("Formato de descarga:", list(FORMATOS), key=f"formato_tecnicos_{self.dia}")
+            extension, mime = FORMATOS[formato]
+            descarga_bajo_demanda(
+                "📥 Descargar distribución final por técnicos", f"final_tecnicos_{self.dia}_{extension}",
+                lambda: exportar_plan(
+                    # Hoja con todos los puntos del día y su técnico asignado
+                    self.df, extension, "Tecnico", "Distribucion_Final_Tecnicos",
+                    # Hoja con resumen por técnico
+                    hojas_extra={"Resumen_Tecnicos": resumen_por(self.df, "Tecnico")}
+                ),
+                f"distribucion_final_tecnicos_dia_{self.dia}.{extension}", mime,
+                huella_plan(self.df, ["Tecnico"])
             )
+
+    def run_todos_los_dias(self):
+        """
+        Asigna técnicos en todos los días a la vez (un proceso por día) y muestra
+        resúmenes y mapas por día a partir del resultado unido.
+        """
+        st.title("👷 Asignación de Técnicos para todos los días")
+        dias = sorted(self.df["Dia"].dropna().unique())
+
+        algoritmo = st.selectbox(
+            "Seleccione algoritmo de asignación entre técnicos",
+            ALGORITMOS_TECNICOS, key="algoritmo_tecnicos_todos"
+        )
+        n_tecnicos = st.number_input(
+            "Técnicos por día (valor inicial para todos los días):",
+            min_value=1, step=1, key="n_tecnicos_todos"
+        )
+
+        # 👉 Cantidad de técnicos editable por día
+        tabla = st.data_editor(
+            pd.DataFrame({"Dia": dias, "Tecnicos": int(n_tecnicos)}),
+            disabled=["Dia"], hide_index=True, key=f"tecnicos_por_dia_{int(n_tecnicos)}"
+        )
+        tecnicos = {
+            dia: max(1, int(n)) for dia, n in zip(tabla["Dia"], tabla["Tecnicos"].fillna(1))
+        }
+        n_workers = st.number_input(
+            "Procesos en paralelo:", min_value=1, max_value=os.cpu_count() or 1,
+            value=min(len(dias), os.cpu_count() or 1) or 1, step=1, key="tecnicos_workers"
+        )
+
+        if st.button("👷 Asignar técnicos en todos los días", key="asignar_tecnicos_todos"):
+            resultado = asignar_tecnicos_por_dia(self.df, algoritmo, tecnicos, n_workers=int(n_workers))
+            # 👉 Una sola escritura en el DataFrame global
+            st.session_state["df"] = resultado
+            self.df = resultado
+            # La vista por día muestra este resultado en lugar de recalcular
+            for dia in dias:
+                st.session_state[f"algoritmo_tecnicos_aplicado_{dia}"] = True
+            st.success(f"✅ Técnicos asignados en {len(dias)} días con {algoritmo}")
+
+        if "Tecnico" not in self.df.columns:
+            return
+
+        # 👉 Resumen día × técnico del resultado unido
+        st.subheader("📊 Puntos por día y técnico")
+        st.dataframe(
+            self.df.pivot_table(index="Dia", columns="Tecnico", values="Latitud",
+                                aggfunc="count", fill_value=0),
+            use_container_width=True
+        )
+
+        dia = st.selectbox("Día a visualizar:", dias, key="dia_mapa_tecnicos_todos")
+        render_colored_map(self.df[self.df["Dia"] == dia], color_by="Tecnico", key="map_tecnicos_todos")
+
+        formato = st.selectbox("Formato de descarga:", list(FORMATOS), key="formato_tecnicos_todos")
+        extension, mime = FORMATOS[formato]
+        descarga_bajo_demanda(
+            "📥 Descargar técnicos de todos los días", f"tecnicos_todos_{extension}",
+            lambda: exportar_plan(
+                self.df, extension, ["Dia", "Tecnico"], "Distribucion_Tecnicos",
+                hojas_extra={"Resumen_Dias": resumen_por(self.df, "Dia")}
+            ),
+            f"distribucion_tecnicos_todos.{extension}", mime,
+            huella_plan(self.df, ["Dia", "Tecnico"])
+        )
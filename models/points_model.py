@@ -1,10 +1,11 @@
-from sklearn.cluster import KMeans
+from utils.agrupamiento import agrupar_kmeans
+from utils.distancias import coordenadas_plano
 
 class PointsModel:
     def __init__(self, df):
         self.df = df
 
     def assign_to_technicians(self, df, tecnicos):
-        kmeans = KMeans(n_clusters=tecnicos, random_state=42).fit(df[['Latitud','Longitud']])
-        df['Tecnico'] = kmeans.labels_
+        xy, _ = coordenadas_plano(df)
+        df['Tecnico'], _ = agrupar_kmeans(xy, tecnicos, random_state=42)
         return df
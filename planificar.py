@@ -0,0 +1,149 @@
+"""
+Planificación por lotes, sin Streamlit: ingesta → días → técnicos (opcional) → exportación.
+
+Uso:
+    python planificar.py entrada/ --dias 6 --salida planes/ --workers 4
+    python planificar.py entrada/ --puntos-por-dia 120 --tecnicos 3 --formato csv
+
+Cada xlsx del directorio se procesa en un proceso del pool; al final se imprime
+(o se guarda con --resumen) un JSON con los tiempos de cada etapa por archivo.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.exportar import FORMATOS, exportar_plan, resumen_por
+from utils.ingesta import cargar_excel
+from views.algorithms import ALGORITMOS, aplicar_algoritmo, asignar_tecnicos_por_dia, capacidades_por_dia
+from views.prueba import asignar_por_kmeans_evolutivo
+from views.refinamiento import refinar_df
+
+ALGORITMOS_DIAS = ALGORITMOS + ["kms-evolutivo"]
+EXTENSIONES = sorted({extension for extension, _ in FORMATOS.values()})
+
+
+def asignar_dias(df, algoritmo, n_dias, refinar=False, tiempo_refinado=2.0):
+    """Columna 'Dia' (1..n_dias) con el mismo algoritmo que se elige en la interfaz."""
+    if algoritmo == "kms-evolutivo":
+        cantidades = list(capacidades_por_dia(len(df), n_dias))
+        df, _ = asignar_por_kmeans_evolutivo(df, cantidades, random_state=42)
+        df["Dia"] = df["Dia"].where(df["Dia"] < 0, df["Dia"] + 1)
+    else:
+        df = aplicar_algoritmo(df, algoritmo, n_dias, columna="Dia")
+
+    if refinar:
+        df = refinar_df(df, "Dia", tiempo_max=tiempo_refinado)
+    return df
+
+
+def planificar_archivo(ruta, opciones):
+    """
+    Procesa un xlsx completo y devuelve el resumen de tiempos (segundos por etapa).
+    Los errores se devuelven en el resumen para no detener el resto del lote.
+    """
+    resumen = {"archivo": os.path.basename(ruta)}
+    tiempos = {}
+    inicio = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        df = cargar_excel(ruta, notificar=False)
+        tiempos["ingesta"] = time.perf_counter() - t
+        resumen["puntos"] = len(df)
+
+        n_dias = opciones["dias"] or max(1, math.ceil(len(df) / opciones["puntos_por_dia"]))
+        resumen["dias"] = n_dias
+
+        t = time.perf_counter()
+        df = asignar_dias(df, opciones["algoritmo"], n_dias, opciones["refinar"], opciones["tiempo_refinado"])
+        tiempos["dias"] = time.perf_counter() - t
+
+        columna = "Dia"
+        if opciones["tecnicos"]:
+            t = time.perf_counter()
+            # Los archivos ya se reparten entre procesos: los días van en serie
+            df = asignar_tecnicos_por_dia(df, opciones["algoritmo_tecnicos"], opciones["tecnicos"])
+            tiempos["tecnicos"] = time.perf_counter() - t
+            columna = ["Dia", "Tecnico"]  # técnicos dentro de cada día (se numeran por día)
+
+        t = time.perf_counter()
+        extension = opciones["formato"]
+        contenido = exportar_plan(
+            df, extension, columna, "Distribucion_Final",
+            hojas_extra={"Resumen": resumen_por(df, "Dia")}
+        )
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        destino = os.path.join(opciones["salida"], f"{nombre}_plan.{extension}")
+        with open(destino, "wb") as f:
+            f.write(contenido)
+        tiempos["exportacion"] = time.perf_counter() - t
+        resumen["salida"] = destino
+    except Exception as e:
+        resumen["error"] = repr(e)
+
+    tiempos["total"] = time.perf_counter() - inicio
+    resumen["tiempos_s"] = {etapa: round(s, 4) for etapa, s in tiempos.items()}
+    return resumen
+
+
+def planificar_directorio(directorio, opciones, workers=1):
+    """Todos los xlsx del directorio, repartidos en `workers` procesos."""
+    archivos = sorted(
+        ruta for ruta in glob.glob(os.path.join(directorio, "*.xlsx"))
+        if not os.path.basename(ruta).startswith("~$")  # temporales de Excel
+    )
+    os.makedirs(opciones["salida"], exist_ok=True)
+
+    inicio = time.perf_counter()
+    if workers > 1 and len(archivos) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            resultados = list(pool.map(planificar_archivo, archivos, [opciones] * len(archivos)))
+    else:
+        resultados = [planificar_archivo(ruta, opciones) for ruta in archivos]
+
+    return {
+        "archivos": len(archivos),
+        "errores": sum("error" in r for r in resultados),
+        "workers": workers,
+        "tiempo_total_s": round(time.perf_counter() - inicio, 4),
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificación por días (y técnicos) de un directorio de xlsx")
+    parser.add_argument("directorio", help="directorio con los xlsx (columnas CONTRATO y COORDENADAS)")
+    cantidad = parser.add_mutually_exclusive_group(required=True)
+    cantidad.add_argument("--dias", type=int, help="número de días por archivo")
+    cantidad.add_argument("--puntos-por-dia", type=int, help="calcula los días como ⌈puntos / valor⌉")
+    parser.add_argument("--algoritmo", choices=ALGORITMOS_DIAS, default="Capacitado")
+    parser.add_argument("--refinar", action="store_true", help="búsqueda local después del algoritmo")
+    parser.add_argument("--tiempo-refinado", type=float, default=2.0)
+    parser.add_argument("--tecnicos", type=int, default=0, help="técnicos por día (0 = no asignar)")
+    parser.add_argument("--algoritmo-tecnicos", choices=ALGORITMOS, default="Capacitado")
+    parser.add_argument("--formato", choices=EXTENSIONES, default="xlsx")
+    parser.add_argument("--salida", default="planes", help="directorio de salida")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--resumen", help="guardar el resumen JSON en este archivo")
+    args = parser.parse_args()
+
+    opciones = {
+        "dias": args.dias, "puntos_por_dia": args.puntos_por_dia,
+        "algoritmo": args.algoritmo, "refinar": args.refinar, "tiempo_refinado": args.tiempo_refinado,
+        "tecnicos": args.tecnicos, "algoritmo_tecnicos": args.algoritmo_tecnicos,
+        "formato": args.formato, "salida": args.salida,
+    }
+    resumen = planificar_directorio(args.directorio, opciones, workers=max(1, args.workers))
+
+    texto = json.dumps(resumen, ensure_ascii=False, indent=2)
+    if args.resumen:
+        with open(args.resumen, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import warnings
+
+import pandas as pd
+
+from controllers.dias_controller import DiasController
+from utils.ingesta import compactar
+
+
+def _plan_renombrado(n=300):
+    return pd.DataFrame({
+        "Latitud": [-8.1 + i * 1e-4 for i in range(n)],
+        "Longitud": [-79.0 + i * 1e-4 for i in range(n)],
+        "Dia": ["Lunes", "Martes", "Miercoles"] * (n // 3),
+        "Distrito": ["Trujillo", "Victor Larco"] * (n // 2),
+    })
+
+
+def test_compactar_no_convierte_etiquetas_en_category():
+    df = compactar(_plan_renombrado())
+    assert df["Dia"].dtype == object
+    assert isinstance(df["Distrito"].dtype, pd.CategoricalDtype)
+
+
+def test_renombrar_dia_tras_carga_compactada(monkeypatch):
+    df = compactar(_plan_renombrado())
+    ctrl = DiasController(df)
+    nombres = {"Lunes": "Lunes 1"}
+    monkeypatch.setattr(
+        "controllers.dias_controller.st.text_input", lambda etiqueta, value, key: nombres.get(value, value)
+    )
+    ctrl.renombrar_dias()
+    assert set(ctrl.data["Dia"]) == {"Lunes 1", "Martes", "Miercoles"}
+
+    # Reasignación manual y resumen por día sin errores ni FutureWarning
+    ctrl.data.loc[ctrl.data.index[:5], "Dia"] = "Dia nuevo"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        conteos = ctrl.data.groupby("Dia").size()
+    assert conteos["Dia nuevo"] == 5
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from utils.distancias import centro_mas_cercano
+
+# 👉 Desde cuántos puntos se usa MiniBatchKMeans en lugar de KMeans completo
+UMBRAL_MINIBATCH = int(os.environ.get("MAPA_GR_UMBRAL_MINIBATCH", "100000"))
+TAMANO_LOTE = 4096
+
+
+def agrupar_kmeans(xy, n_clusters, n_init="auto", max_iter=300, random_state=42, umbral=None, init=None):
+    """
+    KMeans sobre el plano métrico con modo para grandes volúmenes.
+    - Hasta `umbral` puntos (UMBRAL_MINIBATCH por defecto): KMeans completo, igual que antes.
+    - Por encima: MiniBatchKMeans por lotes de TAMANO_LOTE y etiquetado bloque por
+      bloque, sin matrices del tamaño de todo el conjunto.
+    - init: centros iniciales (n_clusters, 2) para arrancar desde un plan previo.
+    Devuelve (etiquetas int32, centros).
+    """
+    umbral = UMBRAL_MINIBATCH if umbral is None else umbral
+    if init is not None:
+        init, n_init = np.asarray(init, dtype=float), 1
+    else:
+        init = "k-means++"
+
+    if len(xy) <= umbral:
+        kmeans = KMeans(n_clusters=n_clusters, init=init, n_init=n_init, max_iter=max_iter,
+                        random_state=random_state)
+        etiquetas = kmeans.fit_predict(xy)
+        return etiquetas.astype(np.int32), kmeans.cluster_centers_
+
+    xy = np.asarray(xy, dtype=np.float32)
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, init=init if isinstance(init, str) else init.astype(np.float32),
+        batch_size=max(TAMANO_LOTE, 3 * n_clusters),
+        n_init=3 if n_init == "auto" else min(int(n_init), 3), max_iter=max_iter,
+        random_state=random_state, compute_labels=False
+    ).fit(xy)
+    centros = kmeans.cluster_centers_.astype(float)
+    etiquetas, _ = centro_mas_cercano(xy, centros)
+    return etiquetas, centros
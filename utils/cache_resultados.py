@@ -0,0 +1,143 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.distancias import coordenadas_plano
+
+MAX_BYTES_RESULTADOS = 128 * 1024 * 1024
+
+
+def huella_coordenadas(coords):
+    """Hash estable del arreglo de coordenadas (forma + bytes en float64)."""
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(coords.shape).encode())
+    h.update(coords.tobytes())
+    return h.hexdigest()
+
+
+def _congelar(valor):
+    """Convierte listas/dicts/arreglos en tuplas para poder usarlos como clave."""
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _congelar(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class CacheEtiquetas:
+    """
+    LRU de resultados de asignación acotado por memoria.
+    Cada entrada guarda solo el arreglo compacto de etiquetas (y los datos extra
+    del algoritmo), nunca DataFrames completos.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_RESULTADOS):
+        self.max_bytes = max_bytes
+        self.bytes_usados = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _tamano(valor):
+        return sum(v.nbytes for v in valor if isinstance(v, np.ndarray)) + 1024
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                return None
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def guardar(self, clave, valor):
+        tamano = self._tamano(valor)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._datos:
+                self.bytes_usados -= self._tamano(self._datos.pop(clave))
+            self._datos[clave] = valor
+            self.bytes_usados += tamano
+            while self.bytes_usados > self.max_bytes:
+                _, viejo = self._datos.popitem(last=False)
+                self.bytes_usados -= self._tamano(viejo)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.bytes_usados = 0
+
+
+CACHE_RESULTADOS = CacheEtiquetas()
+
+
+def clave_resultado(coords, algoritmo, k, params=None, seed=None):
+    """Clave (huella de coordenadas, algoritmo, k, parámetros, semilla)."""
+    return (huella_coordenadas(coords), algoritmo, _congelar(k), _congelar(params or {}), seed)
+
+
+def _resultado_guardado(coords, algoritmo, k, params=None, seed=None):
+    return CACHE_RESULTADOS.obtener(clave_resultado(coords, algoritmo, k, params, seed))
+
+
+def etiquetas_guardadas(coords, algoritmo, k, params=None, seed=None):
+    """Etiquetas ya calculadas para esas coordenadas y configuración, o None."""
+    guardado = _resultado_guardado(coords, algoritmo, k, params, seed)
+    return None if guardado is None else guardado[0]
+
+
+def guardar_etiquetas(coords, algoritmo, k, etiquetas, params=None, seed=None, extra=None):
+    """
+    Guarda etiquetas calculadas fuera de etiquetas_con_memo (p. ej. en un proceso del pool).
+    - extra: datos adicionales del algoritmo (historial, costo) que se devuelven junto a las etiquetas.
+    """
+    CACHE_RESULTADOS.guardar(
+        clave_resultado(coords, algoritmo, k, params, seed), (np.asarray(etiquetas), extra)
+    )
+
+
+def etiquetas_con_memo(coords, algoritmo, k, calcular, params=None, seed=None):
+    """
+    Punto de entrada de la caché: un resultado por (coordenadas, algoritmo, k, parámetros, semilla).
+    - coords: las coordenadas con las que calcula el algoritmo (p. ej. el plano
+      métrico de coordenadas_plano: su origen depende de df.attrs, así que dos
+      planos distintos de los mismos puntos no comparten resultado).
+    - calcular: `calcular() -> etiquetas` alineadas con coords.
+    Devuelve las etiquetas guardadas o recién calculadas (no modificar el arreglo).
+    """
+    etiquetas = etiquetas_guardadas(coords, algoritmo, k, params, seed)
+    if etiquetas is None:
+        etiquetas = np.asarray(calcular())
+        guardar_etiquetas(coords, algoritmo, k, etiquetas, params, seed)
+    return etiquetas
+
+
+def aplicar_con_memo(df, algoritmo, k, calcular, params=None, seed=None, columna="Dia"):
+    """
+    Envoltorio de DataFrame sobre la misma caché que etiquetas_con_memo, para
+    algoritmos que devuelven DataFrame: `calcular(df) -> (df_resultado, extra)`.
+    Devuelve (df con `columna` asignada, extra). Si calcular devuelve None no se guarda nada.
+    La clave usa grados y plano métrico: el algoritmo puede usar ambos.
+    """
+    xy, _ = coordenadas_plano(df)
+    coords = np.column_stack([df[["Latitud", "Longitud"]].to_numpy(dtype=float), xy])
+    guardado = _resultado_guardado(coords, algoritmo, k, params, seed)
+    if guardado is None:
+        resultado, extra = calcular(df)
+        if resultado is None:
+            return None, extra
+
+        # Etiquetas alineadas con las filas de entrada
+        etiquetas = np.empty(len(df), dtype=resultado[columna].dtype)
+        etiquetas[df.index.get_indexer(resultado.index)] = resultado[columna].to_numpy()
+        guardar_etiquetas(coords, algoritmo, k, etiquetas, params, seed, extra)
+        guardado = (etiquetas, extra)
+
+    etiquetas, extra = guardado
+    df = df.copy(deep=False)  # 👉 solo se agrega la columna: el resto se comparte
+    df[columna] = etiquetas
+    return df, extra
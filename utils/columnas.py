@@ -0,0 +1,9 @@
+def columna_contrato(df):
+    """Columna del contrato (cualquier nombre que contenga 'contrato', sin importar mayúsculas ni espacios)."""
+    normalizadas = {str(c).lower().replace(" ", ""): c for c in df.columns}
+    return next((original for norm, original in normalizadas.items() if "contrato" in norm), None)
+
+
+def clave_contrato(serie):
+    """Contratos como texto comparable: sin espacios y sin el '.0' que agrega Excel a los números."""
+    return serie.astype("string").str.strip().str.replace(r"\.0$", "", regex=True)
@@ -1,6 +1,5 @@
 import pandas as pd
 import re
-import streamlit as st
 
 def procesar_coordenadas(coordenada_str):
     if pd.isna(coordenada_str):
@@ -22,20 +21,51 @@ def procesar_coordenadas(coordenada_str):
             return None, None
     return None, None
 
-def extraer_coordenadas(df):
-    st.info("Procesando coordenadas...")
+# Dos primeros tokens separados por comas y/o espacios (como procesar_coordenadas)
+_PATRON_COORDENADAS = re.compile(r'^[\s,]*([^\s,]+)[\s,]+([^\s,]+)')
+
+def parsear_coordenadas(serie):
+    """
+    Versión vectorizada de procesar_coordenadas para una columna completa.
+    Devuelve (latitudes, longitudes) como Series float; NaN donde el valor es inválido.
+    """
+    partes = serie.astype("string").str.extract(_PATRON_COORDENADAS)
+    lat = pd.to_numeric(partes[0], errors='coerce').astype(float)
+    lon = pd.to_numeric(partes[1], errors='coerce').astype(float)
+
+    # Un valor solo es válido si ambos tokens son números
+    invalido = lat.isna() | lon.isna()
+    lat[invalido] = float('nan')
+    lon[invalido] = float('nan')
+    return lat, lon
+
+def _avisos_streamlit():
+    """(info, success, warning) de Streamlit; se importa solo si hay interfaz."""
+    import streamlit as st
+    return st.info, st.success, st.warning
+
+def extraer_coordenadas(df, notificar=True):
+    """
+    Agrega Latitud / Longitud a partir de la columna de coordenadas y descarta las inválidas.
+    - notificar: True muestra avisos en Streamlit; False no usa Streamlit (lotes, CLI);
+      también acepta una función de texto (p. ej. print) para todos los avisos.
+    """
+    if notificar is True:
+        info, exito, aviso = _avisos_streamlit()
+    elif notificar:
+        info = exito = aviso = notificar
+    else:
+        info = exito = aviso = lambda _: None
+
+    info("Procesando coordenadas...")
     columnas_lower = {col.lower(): col for col in df.columns}
 
     if 'coordenadas' in columnas_lower:
         col_real = columnas_lower['coordenadas']
-        coords = df[col_real].apply(procesar_coordenadas)
-        df['Latitud'] = [c[0] for c in coords]
-        df['Longitud'] = [c[1] for c in coords]
+        df['Latitud'], df['Longitud'] = parsear_coordenadas(df[col_real])
     elif 'ubicación' in columnas_lower:
         col_real = columnas_lower['ubicación']
-        coords = df[col_real].apply(procesar_coordenadas)
-        df['Latitud'] = [c[0] for c in coords]
-        df['Longitud'] = [c[1] for c in coords]
+        df['Latitud'], df['Longitud'] = parsear_coordenadas(df[col_real])
     elif 'latitud' in columnas_lower and 'longitud' in columnas_lower:
         lat_col = columnas_lower['latitud']
         lon_col = columnas_lower['longitud']
@@ -48,8 +78,8 @@ def extraer_coordenadas(df):
     df = df.dropna(subset=['Latitud', 'Longitud'])
     validos = len(df)
 
-    st.success(f"✅ Puntos válidos: {validos}/{original_count}")
+    exito(f"✅ Puntos válidos: {validos}/{original_count}")
     if original_count - validos > 0:
-        st.warning(f"⚠️ Se eliminaron {original_count - validos} registros inválidos")
+        aviso(f"⚠️ Se eliminaron {original_count - validos} registros inválidos")
 
     return df.reset_index(drop=True)
@@ -0,0 +1,146 @@
+import numpy as np
+
+RADIO_TIERRA_M = 6_371_008.8
+
+# 👉 Plano métrico local calculado una sola vez en la ingesta
+COLUMNAS_PLANO = ["X_m", "Y_m"]
+ATRIBUTO_ORIGEN = "origen_plano"
+
+# Celdas (puntos × centros) por bloque en los núcleos de distancia
+MAX_ELEMENTOS = 4_000_000
+
+
+def bloques_filas(n, k, max_elementos=MAX_ELEMENTOS):
+    """Rangos [ini, fin) de filas para que cada bloque tenga a lo sumo max_elementos celdas."""
+    paso = max(1, max_elementos // max(1, k))
+    for ini in range(0, n, paso):
+        yield ini, min(ini + paso, n)
+
+
+def haversine_matriz(puntos, centros, max_elementos=MAX_ELEMENTOS):
+    """
+    Distancia haversine en metros entre cada punto y cada centro.
+    - puntos: arreglo (n, 2) de [Latitud, Longitud] en grados.
+    - centros: arreglo (k, 2) de [Latitud, Longitud] en grados.
+    Devuelve una matriz (n, k); los temporales se calculan por bloques de filas.
+    """
+    puntos = np.radians(np.asarray(puntos, dtype=float))
+    centros = np.radians(np.asarray(centros, dtype=float))
+    lat2, lon2 = centros[None, :, 0], centros[None, :, 1]
+    cos_lat2 = np.cos(lat2)
+
+    salida = np.empty((len(puntos), len(centros)))
+    for ini, fin in bloques_filas(len(puntos), len(centros), max_elementos):
+        lat1, lon1 = puntos[ini:fin, 0, None], puntos[ini:fin, 1, None]
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + np.cos(lat1) * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2)
+        salida[ini:fin] = 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return salida
+
+
+def proyectar_local(coords, origen=None):
+    """
+    Proyección equirectangular local a metros.
+    - coords: arreglo (n, 2) de [Latitud, Longitud] en grados.
+    - origen: (lat, lon) de referencia; por defecto el centro de los puntos.
+    Devuelve un arreglo (n, 2) de [x, y] en metros (x hacia el este, y hacia el norte).
+    A escala de ciudad la distorsión es despreciable frente a la distancia geodésica.
+    """
+    coords = np.asarray(coords, dtype=float)
+    if origen is None:
+        origen = coords.mean(axis=0)
+    lat0, lon0 = np.radians(origen[0]), np.radians(origen[1])
+
+    x = RADIO_TIERRA_M * (np.radians(coords[:, 1]) - lon0) * np.cos(lat0)
+    y = RADIO_TIERRA_M * (np.radians(coords[:, 0]) - lat0)
+    return np.column_stack([x, y])
+
+
+def metros_por_grado(origen):
+    """Metros por grado de [longitud, latitud] (ejes x, y del plano) alrededor de `origen`."""
+    por_grado = RADIO_TIERRA_M * np.pi / 180
+    return np.array([por_grado * np.cos(np.radians(origen[0])), por_grado])
+
+
+def agregar_plano(df, origen=None):
+    """
+    Agrega las columnas X_m / Y_m (float32, metros) al DataFrame, en el lugar.
+    El origen de la proyección queda en df.attrs para proyectar centros después.
+    """
+    coords = df[["Latitud", "Longitud"]].to_numpy(dtype=float)
+    if origen is None:
+        origen = coords.mean(axis=0) if len(coords) else (0.0, 0.0)
+    xy = proyectar_local(coords, origen).astype(np.float32)
+    df[COLUMNAS_PLANO[0]] = xy[:, 0]
+    df[COLUMNAS_PLANO[1]] = xy[:, 1]
+    df.attrs[ATRIBUTO_ORIGEN] = [float(origen[0]), float(origen[1])]
+    return df
+
+
+def coordenadas_plano(df):
+    """
+    (xy, origen) de los puntos del DataFrame en el plano métrico.
+    Usa X_m / Y_m de la ingesta si existen; si no, proyecta sobre el centro de los puntos.
+    xy se devuelve en float64 para acumular centroides sin pérdida.
+    """
+    origen = df.attrs.get(ATRIBUTO_ORIGEN)
+    if origen is not None and all(c in df.columns for c in COLUMNAS_PLANO):
+        return df[COLUMNAS_PLANO].to_numpy(dtype=float), tuple(origen)
+
+    coords = df[["Latitud", "Longitud"]].to_numpy(dtype=float)
+    origen = tuple(coords.mean(axis=0)) if len(coords) else (0.0, 0.0)
+    return proyectar_local(coords, origen), origen
+
+
+def distancias_plano(puntos, centros, cuadrado=False, max_elementos=MAX_ELEMENTOS):
+    """
+    Distancia euclídea (o su cuadrado) en el plano entre cada punto y cada centro.
+    - puntos: arreglo (n, 2) en metros; centros: arreglo (k, 2) en metros.
+    Devuelve la matriz (n, k) completa (los temporales van por bloques de filas);
+    para n grande usar centro_mas_cercano o dos_centros_mas_cercanos, que no la construyen.
+    """
+    puntos = np.asarray(puntos, dtype=float)
+    centros = np.asarray(centros, dtype=float)
+    salida = np.empty((len(puntos), len(centros)))
+    for ini, fin in bloques_filas(len(puntos), len(centros), max_elementos):
+        dx = puntos[ini:fin, 0, None] - centros[None, :, 0]
+        dy = puntos[ini:fin, 1, None] - centros[None, :, 1]
+        d2 = dx * dx + dy * dy
+        salida[ini:fin] = d2 if cuadrado else np.sqrt(d2)
+    return salida
+
+
+def centro_mas_cercano(puntos, centros, max_elementos=MAX_ELEMENTOS):
+    """
+    Índice y distancia del centro más cercano a cada punto, sin construir la
+    matriz (n, k) completa: memoria acotada por max_elementos.
+    Los puntos pueden venir en float32; cada bloque se convierte a float64 por separado.
+    """
+    puntos = np.asarray(puntos)
+    indices = np.empty(len(puntos), dtype=np.int32)
+    distancias = np.empty(len(puntos))
+    for ini, fin in bloques_filas(len(puntos), len(centros), max_elementos):
+        d2 = distancias_plano(puntos[ini:fin], centros, cuadrado=True)
+        indices[ini:fin] = d2.argmin(axis=1)
+        distancias[ini:fin] = np.sqrt(d2[np.arange(fin - ini), indices[ini:fin]])
+    return indices, distancias
+
+
+def dos_centros_mas_cercanos(puntos, centros, cuadrado=False, max_elementos=MAX_ELEMENTOS):
+    """
+    Por bloques de filas, sin construir la matriz (n, k) completa:
+    índice del centro más cercano, su distancia (o su cuadrado) y la del segundo
+    más cercano (inf si hay un solo centro).
+    """
+    puntos = np.asarray(puntos)
+    n, k = len(puntos), len(centros)
+    indices = np.empty(n, dtype=np.int64)
+    primera = np.empty(n)
+    segunda = np.full(n, np.inf)
+    for ini, fin in bloques_filas(n, k, max_elementos):
+        d = distancias_plano(puntos[ini:fin], centros, cuadrado=cuadrado)
+        indices[ini:fin] = d.argmin(axis=1)
+        primera[ini:fin] = d[np.arange(fin - ini), indices[ini:fin]]
+        if k > 1:
+            segunda[ini:fin] = np.partition(d, 1, axis=1)[:, 1]
+    return indices, primera, segunda
@@ -0,0 +1,221 @@
+import hashlib
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import pandas as pd
+from openpyxl import Workbook
+
+from utils.columnas import columna_contrato
+from utils.distancias import COLUMNAS_PLANO
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_ZIP = "application/zip"
+
+# 👉 Formatos de exportación: etiqueta -> (extensión, mime)
+FORMATOS = {
+    "Excel (.xlsx)": ("xlsx", MIME_XLSX),
+    "CSV (.csv)": ("csv", "text/csv"),
+    "Parquet (.parquet)": ("parquet", "application/octet-stream"),
+    "GeoJSON (.geojson)": ("geojson", "application/geo+json"),
+    "KML (.kml)": ("kml", "application/vnd.google-earth.kml+xml"),
+}
+
+# Formatos que ya vienen comprimidos: dentro de un zip se guardan tal cual
+FORMATOS_COMPRIMIDOS = {"xlsx", "parquet"}
+
+# Columnas que siempre se exportan como texto (evita notación científica en Excel)
+COLUMNAS_TEXTO = ["Código de identificación interna del predio"]
+
+FILAS_POR_BLOQUE = 5000
+
+
+def nombre_seguro(valor):
+    """Texto apto para nombres de archivo y de hoja (sin espacios ni caracteres reservados)."""
+    return re.sub(r'[\[\]:*?/\\\s]+', "_", str(valor))
+
+
+def resumen_por(df, columna):
+    """Cantidad de puntos por valor de `columna`."""
+    return (
+        df.groupby(columna)
+        .agg(Cantidad_puntos=(columna, "count"))
+        .reset_index()
+    )
+
+
+def sin_columnas_internas(df):
+    """Quita las columnas de trabajo (plano métrico X_m / Y_m) antes de exportar."""
+    internas = [c for c in COLUMNAS_PLANO if c in df.columns]
+    return df.drop(columns=internas) if internas else df
+
+
+def huella_plan(df, columnas):
+    """Hash barato del plan: tamaño, columnas y valores de las columnas de asignación."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.shape, list(df.columns))).encode())
+    for columna in columnas:
+        if columna in df.columns:
+            h.update(pd.util.hash_pandas_object(df[columna], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _escribir_hoja(libro, nombre, df):
+    """
+    Escribe df en una hoja de un libro write-only de openpyxl, por bloques de filas:
+    la memoria usada no depende del tamaño del DataFrame.
+    """
+    df = sin_columnas_internas(df)
+    hoja = libro.create_sheet(title=nombre_seguro(nombre)[:31])
+    hoja.append([str(c) for c in df.columns])
+
+    columnas_texto = [c for c in COLUMNAS_TEXTO if c in df.columns]
+    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+        bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+        if columnas_texto:
+            bloque = bloque.astype({c: str for c in columnas_texto})
+        bloque = bloque.astype(object).where(bloque.notna(), None)
+        for fila in bloque.itertuples(index=False, name=None):
+            hoja.append(fila)
+
+
+def libro_excel(hojas):
+    """
+    Genera un xlsx en memoria.
+    - hojas: dict {nombre de hoja: DataFrame}, en el orden en que deben aparecer.
+    Devuelve los bytes del archivo.
+    """
+    libro = Workbook(write_only=True)
+    for nombre, df in hojas.items():
+        _escribir_hoja(libro, nombre, df)
+
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def exportar_csv(df):
+    """CSV en UTF-8 con BOM (Excel lo abre con tildes correctas)."""
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def exportar_parquet(df):
+    """Parquet columnar; las columnas de texto con tipos mezclados se guardan como texto."""
+    salida = io.BytesIO()
+    try:
+        df.to_parquet(salida, index=False)
+    except Exception:
+        mezcladas = {
+            c: "string" for c in df.columns
+            if df[c].dtype == object and df[c].map(type).nunique() > 1
+        }
+        salida = io.BytesIO()
+        df.astype(mezcladas).to_parquet(salida, index=False)
+    return salida.getvalue()
+
+
+def exportar_geojson(df):
+    """
+    FeatureCollection de puntos. Las propiedades (todas las columnas salvo las
+    coordenadas) se serializan de una vez con to_json y solo se arma el envoltorio
+    de cada Feature.
+    """
+    lat = df["Latitud"].to_numpy(dtype=float).tolist()
+    lon = df["Longitud"].to_numpy(dtype=float).tolist()
+    propiedades = df.drop(columns=["Latitud", "Longitud"])
+    if len(propiedades.columns) and len(df):
+        lineas = propiedades.to_json(
+            orient="records", lines=True, date_format="iso", force_ascii=False
+        ).splitlines()
+    else:
+        lineas = ["{}"] * len(df)
+
+    features = ",".join(
+        '{"type":"Feature","geometry":{"type":"Point","coordinates":[%r,%r]},"properties":%s}'
+        % (x, y, p)
+        for x, y, p in zip(lon, lat, lineas)
+    )
+    return ('{"type":"FeatureCollection","features":[' + features + "]}").encode("utf-8")
+
+
+def columnas_grupo(columna):
+    """'Dia' -> ['Dia']; ['Dia', 'Tecnico'] se deja igual (técnicos agrupados dentro de cada día)."""
+    return [columna] if isinstance(columna, str) else list(columna)
+
+
+def _carpetas_kml(df, columnas, partes, ruta=""):
+    """Una carpeta por valor de la primera columna; las siguientes se anidan dentro."""
+    col_contrato = columna_contrato(df)
+    columna, resto = columnas[0], columnas[1:]
+    for valor, grupo in df.groupby(columna, sort=True):
+        nombre = f"{columna} {valor}"
+        partes.append(f"<Folder><name>{escape(nombre)}</name>")
+        if resto:
+            _carpetas_kml(grupo, resto, partes, f"{ruta}{nombre} / ")
+        else:
+            etiqueta = escape(ruta + nombre)
+            nombres = grupo[col_contrato].astype(str).tolist() if col_contrato else grupo.index.astype(str).tolist()
+            partes.extend(
+                f"<Placemark><name>{escape(n)}</name><description>{etiqueta}</description>"
+                f"<Point><coordinates>{x!r},{y!r}</coordinates></Point></Placemark>"
+                for n, x, y in zip(nombres, grupo["Longitud"].tolist(), grupo["Latitud"].tolist())
+            )
+        partes.append("</Folder>")
+
+
+def exportar_kml(df, columna):
+    """
+    KML con una carpeta (capa) por cada valor de `columna`.
+    Con ['Dia', 'Tecnico'] cada día tiene una subcarpeta por técnico: los números de
+    técnico se repiten entre días y no deben mezclarse en una misma carpeta.
+    """
+    partes = ['<?xml version="1.0" encoding="UTF-8"?>',
+              '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>']
+    _carpetas_kml(df, columnas_grupo(columna), partes)
+    partes.append("</Document></kml>")
+    return "\n".join(partes).encode("utf-8")
+
+
+def exportar_plan(df, extension, columna, nombre_hoja, hojas_extra=None):
+    """
+    Punto único de exportación del plan en cualquier formato de FORMATOS.
+    - columna: 'Dia' o ['Dia', 'Tecnico'] (define las capas del KML).
+    - nombre_hoja / hojas_extra: solo para Excel.
+    """
+    df = sin_columnas_internas(df)
+    if extension == "xlsx":
+        return libro_excel({nombre_hoja: df, **(hojas_extra or {})})
+    if extension == "csv":
+        return exportar_csv(df)
+    if extension == "parquet":
+        return exportar_parquet(df)
+    if extension == "geojson":
+        return exportar_geojson(df)
+    if extension == "kml":
+        return exportar_kml(df, columna)
+    raise ValueError(f"Formato de exportación no soportado: {extension}")
+
+
+def zip_por_grupo(df, columna, prefijo, prefijo_hoja=None, extension="xlsx"):
+    """
+    Un zip con un archivo por cada valor de `columna`, construido en una sola
+    pasada sobre el groupby.
+    - columna: 'Dia', 'Tecnico' (un solo día) o ['Dia', 'Tecnico'] (un archivo por día y técnico).
+    - prefijo: inicio del nombre de cada archivo ({prefijo}_{valor}.{extension}).
+    - prefijo_hoja: inicio del nombre de la hoja en Excel ({prefijo_hoja}_{valor}).
+    """
+    columnas = columnas_grupo(columna)
+    prefijo_hoja = prefijo_hoja or "_".join(columnas)
+    salida = io.BytesIO()
+    # Los xlsx/parquet ya vienen comprimidos: se guardan tal cual; el texto se comprime
+    compresion = zipfile.ZIP_STORED if extension in FORMATOS_COMPRIMIDOS else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(salida, "w", compression=compresion) as zf:
+        for valor, grupo in df.groupby(columnas if len(columnas) > 1 else columnas[0], sort=True):
+            valores = valor if isinstance(valor, tuple) else (valor,)
+            nombre = "_".join(nombre_seguro(v) for v in valores)
+            zf.writestr(
+                f"{prefijo}_{nombre}.{extension}",
+                exportar_plan(grupo, extension, columna, f"{prefijo_hoja}_{nombre}"),
+            )
+    return salida.getvalue()
@@ -0,0 +1,55 @@
+import numpy as np
+from sklearn.neighbors import KDTree
+
+
+class IndiceVecinos:
+    """
+    KD-tree sobre un conjunto fijo de puntos que permite retirar puntos ya usados.
+    Responde "los k puntos disponibles más cercanos" sin reconstruir DataFrames.
+    Cuando más de la mitad de los puntos del árbol ya fueron retirados, el árbol
+    se reconstruye solo con los disponibles, así el costo total queda en O(n log n).
+    """
+
+    def __init__(self, coords, leaf_size=40):
+        self.coords = np.asarray(coords, dtype=float)
+        self.disponible = np.ones(len(self.coords), dtype=bool)
+        self.n_disponibles = len(self.coords)
+        self._construir(np.arange(len(self.coords)), leaf_size)
+
+    def _construir(self, indices, leaf_size=40):
+        self._ids = indices
+        self._arbol = KDTree(self.coords[indices], leaf_size=leaf_size) if len(indices) else None
+
+    def disponibles(self):
+        """Índices de los puntos que aún no se retiraron."""
+        return np.flatnonzero(self.disponible)
+
+    def retirar(self, indices):
+        """Marca los puntos como usados."""
+        indices = np.unique(np.asarray(indices, dtype=int))
+        self.n_disponibles -= int(self.disponible[indices].sum())
+        self.disponible[indices] = False
+
+        if self.n_disponibles < len(self._ids) // 2:
+            self._construir(self.disponibles())
+
+    def vecinos(self, punto, k):
+        """
+        Los k puntos disponibles más cercanos a `punto`.
+        Devuelve (distancias, índices) ordenados de menor a mayor distancia.
+        """
+        k = min(k, self.n_disponibles)
+        if k <= 0:
+            return np.empty(0), np.empty(0, dtype=int)
+
+        punto = np.asarray(punto, dtype=float).reshape(1, -1)
+        pedir = k
+        while True:
+            pedir = min(pedir, len(self._ids))
+            dist, pos = self._arbol.query(punto, k=pedir)
+            ids = self._ids[pos[0]]
+            libres = self.disponible[ids]
+            if libres.sum() >= k or pedir == len(self._ids):
+                return dist[0][libres][:k], ids[libres][:k]
+            # Pedir más candidatos en proporción a los ocupados encontrados
+            pedir = int(k * pedir / max(libres.sum(), 1) * 1.2) + 1
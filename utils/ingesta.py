@@ -0,0 +1,254 @@
+import hashlib
+import io
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.columnas import clave_contrato, columna_contrato
+from utils.coords_utils import extraer_coordenadas
+from utils.distancias import agregar_plano
+from utils.metricas import tipo_etiquetas
+
+# 👉 Cambiar al modificar el parseo: invalida lo que ya esté en caché
+VERSION_INGESTA = 3
+
+DIRECTORIO_CACHE = os.environ.get(
+    "MAPA_GR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "ingesta"),
+)
+MAX_BYTES_DISCO = int(os.environ.get("MAPA_GR_CACHE_MB", "512")) * 1024 * 1024
+MAX_EN_MEMORIA = 8
+UMBRAL_STREAMING = 20 * 1024 * 1024  # xlsx más grandes se leen fila por fila
+
+# 👉 Texto con pocos valores distintos (distrito, tipo de servicio...) se guarda como categoría
+UMBRAL_CATEGORIA = 0.5
+COLUMNAS_ETIQUETA = ["Dia", "Tecnico"]
+COLUMNAS_PRECISAS = ["Latitud", "Longitud"]  # siempre float64
+
+_cache_memoria = OrderedDict()
+
+
+def huella_contenido(contenido):
+    """Hash SHA-256 de los bytes subidos."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _leer_bytes(archivo):
+    if isinstance(archivo, (bytes, bytearray)):
+        return bytes(archivo)
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, "rb") as f:
+            return f.read()
+    return archivo.getvalue()
+
+
+def leer_excel_streaming(contenido):
+    """
+    Lee la primera hoja con openpyxl en modo solo lectura, fila por fila,
+    sin construir el modelo de celdas completo del libro.
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return pd.DataFrame()
+        columnas = [
+            str(c) if c is not None else f"Unnamed: {i}"
+            for i, c in enumerate(encabezado)
+        ]
+        df = pd.DataFrame.from_records(filas, columns=columnas)
+    finally:
+        libro.close()
+    return df.dropna(how="all").reset_index(drop=True)
+
+
+def compactar(df, umbral_categoria=UMBRAL_CATEGORIA):
+    """
+    Reduce la memoria del DataFrame sin cambiar sus valores:
+    - texto repetitivo (valores distintos / filas <= umbral_categoria) -> category;
+    - enteros al tipo más chico que los contiene; decimales a float32 solo si no
+      se pierde nada (Latitud / Longitud quedan en float64);
+    - Dia / Tecnico con valores enteros -> int16 o int32 (ver tipo_etiquetas); con
+      texto (días renombrados) quedan como object: se reasignan y renombran con
+      .loc, lo que un category no permite.
+    Devuelve una copia superficial: las columnas que no cambian se comparten.
+    """
+    df = df.copy(deep=False)
+    n = len(df)
+    for columna in df.columns:
+        serie = df[columna]
+        if columna in COLUMNAS_PRECISAS or n == 0:
+            continue
+
+        if columna in COLUMNAS_ETIQUETA:
+            if pd.api.types.is_numeric_dtype(serie.dtype) and serie.notna().all():
+                valores = serie.to_numpy()
+                if (valores == np.round(valores)).all():
+                    df[columna] = valores.astype(tipo_etiquetas(int(np.abs(valores).max())))
+        elif serie.dtype == object:
+            if pd.api.types.infer_dtype(serie, skipna=True) == "string" and serie.nunique() <= umbral_categoria * n:
+                df[columna] = serie.astype("category")
+        elif pd.api.types.is_integer_dtype(serie.dtype):
+            df[columna] = pd.to_numeric(serie, downcast="integer")
+        elif serie.dtype == np.float64:
+            reducida = serie.astype(np.float32)
+            if np.array_equal(reducida.to_numpy(dtype=np.float64), serie.to_numpy(), equal_nan=True):
+                df[columna] = reducida
+    return df
+
+
+def reporte_memoria(df):
+    """
+    Memoria por columna (incluido el texto de las columnas object), de mayor a
+    menor, con el tipo de cada una y una fila final con el total.
+    """
+    uso = df.memory_usage(deep=True, index=False)
+    reporte = pd.DataFrame({
+        "Columna": [str(c) for c in df.columns],
+        "Tipo": [str(t) for t in df.dtypes],
+        "MB": uso.to_numpy() / 2 ** 20,
+    })
+    total = reporte["MB"].sum()
+    reporte["Porcentaje"] = 100 * reporte["MB"] / total if total else 0.0
+    reporte = reporte.sort_values("MB", ascending=False, ignore_index=True)
+    fila_total = pd.DataFrame([{"Columna": "Total", "Tipo": "", "MB": total, "Porcentaje": 100.0}])
+    return pd.concat([reporte, fila_total], ignore_index=True)
+
+
+def _ruta_cache(clave):
+    return os.path.join(DIRECTORIO_CACHE, f"{clave}.parquet")
+
+
+def _leer_disco(clave):
+    ruta = _ruta_cache(clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        df = pd.read_parquet(ruta)
+    except Exception:
+        return None
+    os.utime(ruta)  # 👉 marca de uso reciente para el LRU
+    return df
+
+
+def _escribir_disco(clave, df):
+    """Guarda el DataFrame en Parquet; si no se puede (sin pyarrow, tipos mixtos) se omite."""
+    try:
+        os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+        temporal = _ruta_cache(clave) + ".tmp"
+        df.to_parquet(temporal, index=False)
+        os.replace(temporal, _ruta_cache(clave))
+    except Exception:
+        return
+    _desalojar_disco()
+
+
+def _desalojar_disco():
+    """Elimina los archivos menos usados hasta quedar bajo MAX_BYTES_DISCO."""
+    archivos = []
+    for nombre in os.listdir(DIRECTORIO_CACHE):
+        if nombre.endswith(".parquet"):
+            ruta = os.path.join(DIRECTORIO_CACHE, nombre)
+            info = os.stat(ruta)
+            archivos.append((info.st_mtime, info.st_size, ruta))
+
+    total = sum(a[1] for a in archivos)
+    for _, tamano, ruta in sorted(archivos):
+        if total <= MAX_BYTES_DISCO:
+            break
+        os.remove(ruta)
+        total -= tamano
+
+
+def _guardar_memoria(clave, df):
+    _cache_memoria[clave] = df
+    _cache_memoria.move_to_end(clave)
+    while len(_cache_memoria) > MAX_EN_MEMORIA:
+        _cache_memoria.popitem(last=False)
+
+
+def cargar_excel(archivo, streaming=None, notificar=True):
+    """
+    Lee un xlsx, extrae las coordenadas, las proyecta al plano métrico (X_m / Y_m) y
+    compacta los tipos (ver compactar), reutilizando el resultado si los mismos
+    bytes ya se procesaron (en memoria o en la caché Parquet en disco).
+    - archivo: archivo subido en Streamlit, bytes o ruta.
+    - streaming: forzar (True) o evitar (False) la lectura fila por fila;
+      por defecto se usa para archivos mayores a UMBRAL_STREAMING.
+    - notificar: avisos del parseo (ver extraer_coordenadas); False para usar sin Streamlit.
+    Devuelve una copia, así las ediciones no alteran lo guardado en caché.
+    """
+    contenido = _leer_bytes(archivo)
+    clave = f"{huella_contenido(contenido)}-v{VERSION_INGESTA}"
+
+    if clave in _cache_memoria:
+        _cache_memoria.move_to_end(clave)
+        return _cache_memoria[clave].copy()
+
+    df = _leer_disco(clave)
+    if df is None:
+        if streaming is None:
+            streaming = len(contenido) > UMBRAL_STREAMING
+        if streaming:
+            df = leer_excel_streaming(contenido)
+        else:
+            df = pd.read_excel(io.BytesIO(contenido))
+        df = compactar(agregar_plano(extraer_coordenadas(df, notificar=notificar)))
+        _escribir_disco(clave, df)
+
+    _guardar_memoria(clave, df)
+    return df.copy()
+
+
+def leer_plan(archivo, columnas=("Dia", "Tecnico")):
+    """
+    Lee un plan ya exportado (xlsx, csv o parquet; del xlsx se usa la primera hoja,
+    Distribucion_Final) y deja solo el contrato y las columnas de asignación.
+    - archivo: archivo subido en Streamlit, bytes o ruta.
+    """
+    contenido = _leer_bytes(archivo)
+    nombre = str(getattr(archivo, "name", archivo if isinstance(archivo, (str, os.PathLike)) else "")).lower()
+    if nombre.endswith(".csv"):
+        plan = pd.read_csv(io.BytesIO(contenido), encoding="utf-8-sig")
+    elif nombre.endswith(".parquet"):
+        plan = pd.read_parquet(io.BytesIO(contenido))
+    else:
+        plan = pd.read_excel(io.BytesIO(contenido))
+
+    col_contrato = columna_contrato(plan)
+    if col_contrato is None or "Dia" not in plan.columns:
+        raise ValueError("❌ El plan previo debe tener la columna de contrato y la columna 'Dia'")
+    return plan[[col_contrato] + [c for c in columnas if c in plan.columns]]
+
+
+def cruzar_por_contrato(df, plan, columnas=("Dia", "Tecnico")):
+    """
+    Copia a df las columnas de asignación del plan previo, emparejando filas por contrato.
+    Los contratos nuevos quedan con NaN; si un contrato se repite en el plan vale la primera fila.
+    Devuelve (df con las columnas, filas del plan cuyos contratos ya no están en df).
+    """
+    col_df, col_plan = columna_contrato(df), columna_contrato(plan)
+    if col_df is None or col_plan is None:
+        raise ValueError("❌ No se encontró la columna de contrato para cruzar con el plan previo")
+
+    claves_plan = pd.Index(clave_contrato(plan[col_plan]))
+    claves_df = clave_contrato(df[col_df])
+    unicas = ~claves_plan.duplicated()
+    posiciones = claves_plan[unicas].get_indexer(claves_df)
+    encontrados = posiciones >= 0
+
+    df = df.copy()
+    filas_plan = plan[unicas]
+    for columna in columnas:
+        if columna in plan.columns:
+            valores = filas_plan[columna].to_numpy()
+            df[columna] = pd.Series(valores[np.where(encontrados, posiciones, 0)], index=df.index).where(encontrados)
+
+    eliminados = plan[unicas][~claves_plan[unicas].isin(claves_df)]
+    return df, eliminados
+
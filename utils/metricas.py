@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from utils.distancias import coordenadas_plano, metros_por_grado
+
+# Constante de Beardwood–Halton–Hammersley: ruta ≈ 0.7124 · √(n · área)
+CONSTANTE_RUTA = 0.7124
+
+# Penalización por punto sin asignar (como en evaluate_cost)
+PENALIZACION_SIN_ASIGNAR = 5.0
+
+
+def codificar_etiquetas(serie):
+    """
+    Etiquetas de un DataFrame (días o técnicos, números o nombres) a códigos 0..k-1.
+    Los valores nulos quedan como -1 (sin asignar).
+    Devuelve (códigos int32, categorías ordenadas).
+    """
+    codigos, categorias = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int32), list(categorias)
+
+
+def tipo_etiquetas(n_grupos):
+    """Entero más chico para etiquetas -1..n_grupos: int16 hasta 32 767 grupos, si no int32."""
+    return np.int16 if n_grupos < 2 ** 15 else np.int32
+
+
+class MetricasPlan:
+    """
+    Métricas de un plan a partir de arreglos: mismos términos de costo que
+    evaluate_cost (dispersión, cruce, desbalance, sin asignar) más la dispersión
+    y el largo de ruta estimado de cada grupo.
+    - grados: arreglo (n, 2) de [Latitud, Longitud]; el costo se mide en grados.
+    - etiquetas: códigos 0..k-1 (-1 = sin asignar).
+    - cantidades: puntos esperados por grupo (define k).
+    - xy: plano métrico (n, 2); por defecto se proyecta sobre el centro de los puntos.
+    Todo se calcula en una pasada vectorizada; `mover` actualiza en O(k) más los
+    puntos movidos, y solo recorre un grupo si salió uno de sus puntos extremos.
+    """
+
+    def __init__(self, grados, etiquetas, cantidades, alpha=1.0, beta=3.0, gamma=2.0, xy=None):
+        self.grados = np.asarray(grados, dtype=float)
+        if xy is None:
+            xy, origen = coordenadas_plano(pd.DataFrame(self.grados, columns=["Latitud", "Longitud"]))
+        else:
+            origen = self.grados.mean(axis=0) if len(self.grados) else (0.0, 0.0)
+        self.xy = np.asarray(xy, dtype=float)
+        self.escala = metros_por_grado(origen)
+        self.etiquetas = np.asarray(etiquetas, dtype=np.int32).copy()
+        self.cantidades = np.asarray(cantidades, dtype=np.int64)
+        self.alpha, self.beta, self.gamma = alpha, beta, gamma
+
+        # Grupo k = sin asignar (cuenta para el cruce, como en evaluate_cost)
+        self.k = len(self.cantidades)
+        g = self._grupo(self.etiquetas)
+        m = self.k + 1
+        self.conteos = np.bincount(g, minlength=m)
+        self.suma = np.column_stack([np.bincount(g, weights=self.xy[:, e], minlength=m) for e in range(2)])
+        self.suma2 = np.bincount(g, weights=(self.xy ** 2).sum(axis=1), minlength=m)
+        self.minimos = np.full((m, 2), np.inf)
+        self.maximos = np.full((m, 2), -np.inf)
+        for e in range(2):
+            np.minimum.at(self.minimos[:, e], g, self.grados[:, e])
+            np.maximum.at(self.maximos[:, e], g, self.grados[:, e])
+
+    def _grupo(self, etiquetas):
+        etiquetas = np.asarray(etiquetas)
+        return np.where(etiquetas < 0, self.k, etiquetas)
+
+    def _recalcular_extremos(self, grupo):
+        miembros = self.grados[self._grupo(self.etiquetas) == grupo]
+        if len(miembros):
+            self.minimos[grupo] = miembros.min(axis=0)
+            self.maximos[grupo] = miembros.max(axis=0)
+        else:
+            self.minimos[grupo] = np.inf
+            self.maximos[grupo] = -np.inf
+
+    def mover(self, indices, destino):
+        """
+        Reasigna los puntos `indices` al grupo `destino` (-1 = sin asignar).
+        Sumas y conteos se ajustan con los puntos movidos; el rectángulo de un
+        grupo de origen solo se recalcula si uno de sus extremos se fue.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        m = self.k + 1
+        origen = self._grupo(self.etiquetas[indices])
+        d = self.k if destino < 0 else int(destino)
+
+        sale = np.bincount(origen, minlength=m)
+        self.conteos -= sale
+        self.conteos[d] += len(indices)
+        for e in range(2):
+            peso = np.bincount(origen, weights=self.xy[indices, e], minlength=m)
+            self.suma[:, e] -= peso
+            self.suma[d, e] += peso.sum()
+        peso2 = np.bincount(origen, weights=(self.xy[indices] ** 2).sum(axis=1), minlength=m)
+        self.suma2 -= peso2
+        self.suma2[d] += peso2.sum()
+
+        puntos = self.grados[indices]
+        self.etiquetas[indices] = destino
+        self.minimos[d] = np.minimum(self.minimos[d], puntos.min(axis=0))
+        self.maximos[d] = np.maximum(self.maximos[d], puntos.max(axis=0))
+
+        for grupo in np.flatnonzero(sale):
+            if grupo == d:
+                continue
+            salientes = puntos[origen == grupo]
+            if ((salientes <= self.minimos[grupo]).any() or (salientes >= self.maximos[grupo]).any()):
+                self._recalcular_extremos(grupo)
+
+    def terminos(self):
+        """Términos de evaluate_cost y el costo total, en O(k log k)."""
+        k = self.k
+        conteos = self.conteos[:k]
+        rango = self.maximos[:k] - self.minimos[:k]
+        areas = np.where(conteos > 0, rango[:, 0] * rango[:, 1], 1.0)
+        dispersion = float(areas.sum())
+
+        con_puntos = np.flatnonzero(self.conteos > 0)
+        orden = con_puntos[np.argsort(self.minimos[con_puntos, 1], kind="stable")]
+        izq, der = self.minimos[orden, 1], self.maximos[orden, 1]
+        cruce = float(np.clip(der[:-1] - izq[1:], 0.0, None).sum())
+
+        desbalance = int(np.abs(self.cantidades - conteos).sum())
+        sin_asignar = int(self.conteos[k])
+        costo = (self.alpha * dispersion + self.beta * cruce + self.gamma * desbalance
+                 + sin_asignar * PENALIZACION_SIN_ASIGNAR)
+        return {
+            "costo": costo, "dispersion": dispersion, "cruce": cruce,
+            "desbalance": desbalance, "sin_asignar": sin_asignar,
+            "ruta_estimada_m": float(self.por_grupo()["Ruta_estimada_m"].sum()),
+        }
+
+    def por_grupo(self):
+        """
+        Tabla por grupo (código 0..k-1): cantidad, esperado, dispersión media
+        al centroide (RMS, metros), área del rectángulo (km²) y ruta estimada (m).
+        """
+        k = self.k
+        n = self.conteos[:k]
+        con_puntos = n > 0
+        centro = np.zeros((k, 2))
+        centro[con_puntos] = self.suma[:k][con_puntos] / n[con_puntos, None]
+        varianza = np.zeros(k)
+        varianza[con_puntos] = self.suma2[:k][con_puntos] / n[con_puntos] - (centro[con_puntos] ** 2).sum(axis=1)
+        rango = np.where(con_puntos[:, None], self.maximos[:k] - self.minimos[:k], 0.0)
+        # Rango en grados [lat, lon] -> metros [norte, este]
+        area_m2 = rango[:, 0] * self.escala[1] * rango[:, 1] * self.escala[0]
+        return pd.DataFrame({
+            "Grupo": np.arange(k),
+            "Cantidad": n,
+            "Esperado": self.cantidades,
+            "Dispersion_m": np.sqrt(np.clip(varianza, 0.0, None)),
+            "Area_km2": area_m2 / 1e6,
+            "Ruta_estimada_m": CONSTANTE_RUTA * np.sqrt(n * area_m2),
+        })
+
+
+def metricas_df(df, columna="Dia", cantidades=None, **pesos):
+    """
+    MetricasPlan de un DataFrame con la columna de asignación `columna`.
+    - cantidades: esperados por grupo en el orden de las categorías; por defecto reparto parejo.
+    Devuelve (MetricasPlan, categorías).
+    """
+    codigos, categorias = codificar_etiquetas(df[columna])
+    if cantidades is None or len(cantidades) != len(categorias):
+        base, extra = divmod(int((codigos >= 0).sum()), max(1, len(categorias)))
+        cantidades = [base + (1 if i < extra else 0) for i in range(len(categorias))]
+    xy, _ = coordenadas_plano(df)
+    grados = df[["Latitud", "Longitud"]].to_numpy(dtype=float)
+    return MetricasPlan(grados, codigos, cantidades, xy=xy, **pesos), categorias
@@ -0,0 +1,71 @@
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+TIPOS_AREA = ("Polygon", "MultiPolygon")
+
+
+def geometrias_dibujadas(output):
+    """
+    Geometrías GeoJSON dibujadas en el mapa (salida de st_folium).
+    Usa todos los dibujos de `all_drawings`; si no hay, el último dibujo activo.
+    """
+    if not output:
+        return []
+    geometrias = [d.get("geometry") for d in (output.get("all_drawings") or [])]
+    geometrias = [g for g in geometrias if g and g.get("type") in TIPOS_AREA]
+    if not geometrias and output.get("last_active_drawing"):
+        g = output["last_active_drawing"].get("geometry")
+        if g and g.get("type") in TIPOS_AREA:
+            geometrias = [g]
+    return geometrias
+
+
+def geometria_seleccion(geometrias):
+    """
+    Une varios Polygon/MultiPolygon GeoJSON (con huecos y todas sus partes)
+    en una sola geometría preparada. Devuelve None si no hay áreas.
+    """
+    areas = []
+    for g in geometrias:
+        if not g or g.get("type") not in TIPOS_AREA:
+            continue
+        area = shape(g)
+        if not area.is_valid:
+            area = area.buffer(0)
+        if not area.is_empty:
+            areas.append(area)
+    if not areas:
+        return None
+
+    union = shapely.union_all(areas)
+    shapely.prepare(union)
+    return union
+
+
+def puntos_en_geometria(lon, lat, geometria):
+    """
+    Máscara booleana de los puntos dentro de `geometria` (mismo criterio que
+    Polygon.contains: los puntos sobre el borde quedan fuera).
+    Primero se descartan los puntos fuera del bounding box y solo el resto pasa
+    por el predicado vectorizado `contains_xy`.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    mascara = np.zeros(len(lon), dtype=bool)
+    if geometria is None or geometria.is_empty:
+        return mascara
+
+    minx, miny, maxx, maxy = geometria.bounds
+    candidatos = np.flatnonzero((lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy))
+    if len(candidatos):
+        mascara[candidatos] = shapely.contains_xy(geometria, lon[candidatos], lat[candidatos])
+    return mascara
+
+
+def seleccionar_puntos(df, output):
+    """Filas de df dentro de los polígonos dibujados (None si no hay dibujos de área)."""
+    geometria = geometria_seleccion(geometrias_dibujadas(output))
+    if geometria is None:
+        return None
+    return df[puntos_en_geometria(df["Longitud"], df["Latitud"], geometria)]
@@ -1,258 +1,528 @@
-import pandas as pd
-from sklearn.cluster import KMeans
-import streamlit as st
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.cluster import kmeans_plusplus
 import numpy as np
- 
-from sklearn.metrics import pairwise_distances
-from geopy.distance import geodesic
 
-def aplicar_algoritmo(df, algoritmo, n_clusters, columna="Dia"):
+from utils.agrupamiento import agrupar_kmeans
+from utils.distancias import coordenadas_plano, distancias_plano, dos_centros_mas_cercanos
+from utils.indice_espacial import IndiceVecinos
+from utils.cache_resultados import etiquetas_con_memo, etiquetas_guardadas, guardar_etiquetas
+from utils.metricas import codificar_etiquetas, tipo_etiquetas
+
+ALGORITMOS = ["Por zona", "Por proximidad", "Balanceado Preciso", "Capacitado", "Sweep", "kms"]
+
+# 👉 Algoritmos basados en centroides: pueden reanudar desde un plan previo
+ALGORITMOS_ARRANQUE = ["Por zona", "Por proximidad", "Balanceado Preciso", "Capacitado"]
+# Iteraciones de Lloyd al reanudar: los centros ya están cerca, basta con reequilibrar
+ITER_ARRANQUE = 5
+
+# ------------------------------
+# Núcleo sobre arreglos: coordenadas (n, 2) en metros + tamaños por grupo -> etiquetas 0..k-1
+# ------------------------------
+def etiquetas_algoritmo(xy, algoritmo, capacidades, centroides_iniciales=None):
+    """
+    Ejecuta un algoritmo de ALGORITMOS sin pasar por DataFrames.
+    - xy: arreglo (n, 2) contiguo en el plano métrico (ver coordenadas_plano).
+    - capacidades: puntos por grupo; su largo es la cantidad de grupos
+      (Por zona y Por proximidad solo usan la cantidad).
+    - centroides_iniciales: centros (k, 2) para reanudar (ALGORITMOS_ARRANQUE).
+    Devuelve etiquetas int32 alineadas con xy.
+    """
+    n_grupos = len(capacidades)
+    if algoritmo == "Por zona":
+        return etiquetas_por_zona(xy, n_grupos, centroides_iniciales=centroides_iniciales)
+    if algoritmo == "Por proximidad":
+        return etiquetas_por_proximidad(xy, n_grupos, centroides_iniciales=centroides_iniciales)
+    if algoritmo == "Balanceado Preciso":
+        if centroides_iniciales is None:
+            return etiquetas_balanceado_preciso(xy, capacidades)
+        return etiquetas_balanceado_preciso(xy, capacidades, max_iter=ITER_ARRANQUE,
+                                            centroides_iniciales=centroides_iniciales)
+    if algoritmo == "Capacitado":
+        if centroides_iniciales is None:
+            return etiquetas_capacitado(xy, capacidades)
+        return etiquetas_capacitado(xy, capacidades, max_iter=ITER_ARRANQUE,
+                                    centroides_iniciales=centroides_iniciales)
+    if algoritmo == "Sweep":
+        return etiquetas_sweep(xy, capacidades)
+    if algoritmo == "kms":
+        return etiquetas_kms(xy, capacidades)
+    raise ValueError(f"Algoritmo no soportado: {algoritmo}")
+
+def _con_columna(df, etiquetas, columna="Dia"):
+    """
+    Copia superficial de df con la columna de etiquetas: el resto de columnas se
+    comparte con df, así un libro ancho no se duplica en cada asignación.
+    El orden de visita (columna 'Orden') era de las etiquetas anteriores y se quita.
+    """
+    df = df.copy(deep=False)
+    df[columna] = etiquetas
+    if "Orden" in df.columns:
+        del df["Orden"]
+    return df
+
+def centroides_arranque(xy, etiquetas, n_nuevo):
+    """
+    Centroides para pasar de una asignación previa con k grupos a n_nuevo grupos.
+    - k -> k+1: se parte el grupo más disperso (mayor suma de distancias² al centro)
+      en dos mitades iguales por su eje principal.
+    - k -> k-1: se unen los dos grupos con centros más cercanos.
+    Se repite hasta llegar a n_nuevo; los demás grupos conservan centro y número.
+    Devuelve un arreglo (n_nuevo, 2), o None si no se puede (grupos de un punto).
+    """
+    validos = etiquetas >= 0
+    xy, etiquetas = xy[validos], etiquetas[validos]
+    if len(xy) < n_nuevo:
+        return None
+
+    orden = np.argsort(etiquetas, kind="stable")
+    cortes = np.flatnonzero(np.diff(etiquetas[orden])) + 1
+    grupos = np.split(xy[orden], cortes)
+
+    while len(grupos) < n_nuevo:
+        dispersion = [((g - g.mean(axis=0)) ** 2).sum() for g in grupos]
+        i = int(np.argmax(dispersion))
+        g = grupos[i]
+        if len(g) < 2:
+            return None
+        centrado = g - g.mean(axis=0)
+        _, vectores = np.linalg.eigh(np.cov(centrado.T))
+        proyeccion = centrado @ vectores[:, -1]
+        mitad = proyeccion <= np.median(proyeccion)
+        if mitad.all():
+            mitad[np.argmax(proyeccion)] = False
+        grupos[i] = g[mitad]
+        grupos.append(g[~mitad])
+
+    while len(grupos) > n_nuevo:
+        centros = np.array([g.mean(axis=0) for g in grupos])
+        dist = distancias_plano(centros, centros)
+        np.fill_diagonal(dist, np.inf)
+        i, j = sorted(np.unravel_index(np.argmin(dist), dist.shape))
+        grupos[i] = np.vstack([grupos[i], grupos[j]])
+        del grupos[j]
+
+    return np.array([g.mean(axis=0) for g in grupos])
+
+def aplicar_algoritmo(df, algoritmo, n_clusters, columna="Dia", previo=None):
     """
     Aplica un algoritmo de asignación sobre df.
     - algoritmo: nombre del algoritmo (Zona, Proximidad, Preciso, Capacitado, Sweep, Secuencial, KMeans)
     - n_clusters: número de días o técnicos
-    - columna: 'Dia' o 'Tecnico'
+    - columna: 'Dia' o 'Tecnico' (etiquetas 1..n_clusters; solo se escribe esa columna)
+    - previo: etiquetas de la asignación anterior (alineadas con df). Con un
+      algoritmo de ALGORITMOS_ARRANQUE se arranca desde ese plan (partiendo o
+      uniendo grupos) en lugar de recalcular desde cero.
+    Los resultados se memorizan por (coordenadas en el plano, algoritmo, n_clusters):
+    volver a una configuración ya calculada no repite el cálculo.
     """
-    df = df.copy()
+    if algoritmo not in ALGORITMOS:
+        return df.copy()
+
+    xy, _ = coordenadas_plano(df)
+
+    centroides, params = None, None
+    if previo is not None and algoritmo in ALGORITMOS_ARRANQUE:
+        codigos, _ = codificar_etiquetas(previo)
+        centroides = centroides_arranque(xy, codigos, n_clusters)
+        if centroides is not None:
+            params = {"centroides_iniciales": np.round(centroides, 1)}
+
+    capacidades = capacidades_por_dia(len(xy), n_clusters)
+    etiquetas = etiquetas_con_memo(
+        xy, algoritmo, n_clusters,
+        lambda: etiquetas_algoritmo(xy, algoritmo, capacidades, centroides),
+        params=params, seed=42
+    )
 
-    if algoritmo == "Por zona":
-        df = asignar_por_zona(df, n_clusters)
-    elif algoritmo == "Por proximidad":
-        df = distribucion_por_proximidad(df, n_clusters)
-    elif algoritmo == "Balanceado Preciso":
-        df = asignar_balanceado_preciso(df, n_clusters)
-    elif algoritmo == "Capacitado":
-        df = asignar_capacitado(df, n_clusters)
-    elif algoritmo == "Sweep":
-        df = asignar_sweep(df, n_clusters)
-    elif algoritmo == "kms":
-        cantidades = [len(df)//n_clusters] * n_clusters
-        df = asignar_por_kmeans(df, cantidades)
-
-    # 👉 Ajuste: convertir días de 0–(n-1) a 1–n 
-    if "Dia" in df.columns: 
-        df["Dia"] = df["Dia"].astype(int) + 1
-
-    # 👉 Si la columna destino no es 'Dia', copiar resultado
-    if columna != "Dia":
-        df[columna] = df["Dia"]
+    # 👉 Ajuste: convertir grupos de 0–(n-1) a 1–n
+    return _con_columna(df, (etiquetas + 1).astype(tipo_etiquetas(n_clusters)), columna)
 
-    return df
+def _tecnicos_de_dia(args):
+    """Etiquetas de técnico (0..k-1) de un día; corre en un proceso del pool."""
+    xy, algoritmo, k = args
+    return etiquetas_algoritmo(xy, algoritmo, capacidades_por_dia(len(xy), k))
+
+def asignar_tecnicos_por_dia(df, algoritmo, tecnicos, n_workers=1):
+    """
+    Asigna técnicos dentro de cada día, todos los días a la vez.
+    - tecnicos: cantidad para todos los días o dict {dia: cantidad}.
+    - n_workers: procesos en paralelo (un día por tarea).
+    Solo se envían las coordenadas de cada día a los procesos; las etiquetas se
+    unen en una sola escritura de la columna 'Tecnico'. 'Dia' no se modifica.
+    La caché de resultados se consulta y se llena en este proceso: al pool solo
+    van los días que no estaban calculados.
+    """
+    xy, _ = coordenadas_plano(df)
+    dias, resultados, pendientes = [], [], []
+    for dia, posiciones in df.groupby("Dia", sort=True).indices.items():
+        n_tecnicos = tecnicos.get(dia, 1) if isinstance(tecnicos, dict) else tecnicos
+        k = max(1, min(int(n_tecnicos), len(posiciones)))
+        dias.append(posiciones)
+        resultados.append(etiquetas_guardadas(xy[posiciones], algoritmo, k, seed=42))
+        if resultados[-1] is None:
+            pendientes.append((len(dias) - 1, k))
+
+    tareas = [(xy[dias[i]], algoritmo, k) for i, k in pendientes]
+    if n_workers > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            calculadas = list(pool.map(_tecnicos_de_dia, tareas))
+    else:
+        calculadas = [_tecnicos_de_dia(t) for t in tareas]
+
+    for (i, k), etiquetas in zip(pendientes, calculadas):
+        guardar_etiquetas(xy[dias[i]], algoritmo, k, etiquetas, seed=42)
+        resultados[i] = etiquetas
+
+    maximo = max((int(e.max()) + 1 for e in resultados if len(e)), default=0)
+    tecnico = np.zeros(len(df), dtype=tipo_etiquetas(maximo))
+    for posiciones, etiquetas in zip(dias, resultados):
+        tecnico[posiciones] = etiquetas + 1
+
+    return _con_columna(df, tecnico, "Tecnico")
+
+def etiquetas_por_zona(xy, n_dias, random_state=42, centroides_iniciales=None):
+    """
+    Zonas geográficas con KMeans; cada zona se interpreta como un día.
+    - centroides_iniciales: centros (n_dias, 2) en el plano para arrancar desde un plan previo.
+    """
+    if len(xy) < n_dias:
+        return np.zeros(len(xy), dtype=np.int32)
+    etiquetas, _ = agrupar_kmeans(xy, n_dias, random_state=random_state, init=centroides_iniciales)
+    return etiquetas
 
-def asignar_por_zona(df, n_dias, random_state=42):
+def asignar_por_zona(df, n_dias, random_state=42, centroides_iniciales=None):
     """
     Asigna puntos por zona geográfica usando KMeans.
     Cada zona se interpreta como un día.
+    - centroides_iniciales: centros (n_dias, 2) en el plano para arrancar desde un plan previo.
     """
-    df = df.copy()
+    xy, _ = coordenadas_plano(df)
+    return _con_columna(df, etiquetas_por_zona(xy, n_dias, random_state, centroides_iniciales))
 
-    if len(df) < n_dias:
-        df["Dia"] = 0
-        return df
+def etiquetas_por_proximidad(xy, n_dias, centroides_iniciales=None):
+    """
+    KMeans con los clusters numerados de sur a norte (y de oeste a este en empate),
+    para que los días sean consistentes entre corridas.
+    """
+    etiquetas, _ = agrupar_kmeans(xy, n_dias, n_init=10, random_state=42, init=centroides_iniciales)
 
-    coords = df[["Latitud", "Longitud"]].values
-    kmeans = KMeans(n_clusters=n_dias, random_state=random_state)
-    labels = kmeans.fit_predict(coords)
+    # Ordenar clusters por su centro (en el plano, y crece con la latitud y x con la longitud)
+    conteos = np.maximum(np.bincount(etiquetas, minlength=n_dias), 1)
+    cx = np.bincount(etiquetas, weights=xy[:, 0], minlength=n_dias) / conteos
+    cy = np.bincount(etiquetas, weights=xy[:, 1], minlength=n_dias) / conteos
+    presentes = np.flatnonzero(np.bincount(etiquetas, minlength=n_dias))
+    orden_clusters = presentes[np.lexsort((cx[presentes], cy[presentes]))]
 
-    df["Dia"] = labels.astype(int)
-    return df
+    mapping = np.zeros(n_dias, dtype=np.int32)
+    mapping[orden_clusters] = np.arange(len(orden_clusters))
+    return mapping[etiquetas]
 
-def distribucion_por_proximidad(df, n_dias):
+def distribucion_por_proximidad(df, n_dias, centroides_iniciales=None):
     """
     Distribuye puntos por proximidad geográfica usando KMeans.
     Cada cluster se interpreta como un día.
+    - centroides_iniciales: centros (n_dias, 2) en el plano para arrancar desde un plan previo.
     """
-    df = df.copy()
-    coords = df[['Latitud', 'Longitud']].values
-    kmeans = KMeans(n_clusters=n_dias, random_state=42, n_init=10)
-    df['Dia'] = kmeans.fit_predict(coords)
-
-    # Ordenar clusters para que los días sean consistentes
-    orden_clusters = (
-        df.groupby("Dia")[["Latitud", "Longitud"]]
-        .mean()
-        .sort_values(by=["Latitud", "Longitud"])
-        .index.tolist()
-    )
-    mapping = {cluster: i for i, cluster in enumerate(orden_clusters)}
-    df['Dia'] = df['Dia'].map(mapping)
+    xy, _ = coordenadas_plano(df)
+    return _con_columna(df, etiquetas_por_proximidad(xy, n_dias, centroides_iniciales))
 
-    df["Dia"] = df["Dia"].astype(int)
-    return df
+def capacidades_por_dia(n_points, n_dias):
+    """
+    Cantidad exacta de puntos por día: n // n_dias y los sobrantes
+    repartidos de a uno entre los primeros días.
+    """
+    target_size, extra = divmod(n_points, n_dias)
+    return np.array([target_size + (1 if dia < extra else 0) for dia in range(n_dias)])
+
+def _llenado_balanceado(coords, centroides, capacidades):
+    """
+    Greedy global: recorre los pares (punto, día) de menor a mayor costo
+    (distancia² al centroide) y asigna cada punto al primer día que todavía tenga cupo.
+    Se resuelve por rondas vectorizadas sobre las propuestas (el día abierto más
+    barato de cada punto pendiente) ordenadas por costo: se aceptan todas hasta la
+    que completa el cupo de algún día, ese día se cierra y solo los puntos que lo
+    proponían recalculan su propuesta (a lo sumo k rondas).
+    Salvo empates exactos de costo, el resultado es el del recorrido par por par.
+    Los costos se calculan por bloques: nunca se arma la matriz (n, k).
+    """
+    n_points, n_dias = len(coords), len(centroides)
+    asignaciones = np.full(n_points, -1)
+    restante = np.asarray(capacidades).copy()
+    tipo_dia = np.int16 if n_dias < 2 ** 15 else np.int32
+
+    # Propuestas iniciales ordenadas por costo
+    dias, propuesta, _ = dos_centros_mas_cercanos(coords, centroides, cuadrado=True)
+    dias = dias.astype(tipo_dia)
+    orden = np.argsort(propuesta, kind="stable")
+    puntos, dias, propuesta = orden, dias[orden], propuesta[orden]
+
+    while len(puntos):
+        # Posición de cada propuesta dentro de su día (radix sort estable sobre enteros)
+        por_dia = np.argsort(dias, kind="stable")
+        dias_ord = dias[por_dia]
+        rango = np.empty(len(dias), dtype=np.int64)
+        rango[por_dia] = np.arange(len(dias)) - np.searchsorted(dias_ord, dias_ord, side="left")
+
+        llenan = np.flatnonzero(rango == restante[dias] - 1)
+        if len(llenan) == 0:
+            asignaciones[puntos] = dias
+            break
+
+        corte = llenan[0] + 1
+        cerrado = dias[corte - 1]
+        asignaciones[puntos[:corte]] = dias[:corte]
+        restante -= np.bincount(dias[:corte], minlength=n_dias)
+
+        puntos, dias, propuesta = puntos[corte:], dias[corte:], propuesta[corte:]
+        rechazados = dias == cerrado
+        if not rechazados.any():
+            continue
+
+        # Solo quienes proponían el día cerrado eligen su siguiente día abierto
+        abiertos = np.flatnonzero(restante > 0)
+        rp = puntos[rechazados]
+        pos, rp_costo, _ = dos_centros_mas_cercanos(coords[rp], centroides[abiertos], cuadrado=True)
+        rp_orden = np.argsort(rp_costo, kind="stable")
 
-def asignar_balanceado_preciso(df, n_dias, max_iter=100):
+        # Mezclar dos secuencias ya ordenadas (timsort las une en tiempo lineal)
+        puntos = np.concatenate([puntos[~rechazados], rp[rp_orden]])
+        dias = np.concatenate([dias[~rechazados], abiertos[pos[rp_orden]].astype(tipo_dia)])
+        propuesta = np.concatenate([propuesta[~rechazados], rp_costo[rp_orden]])
+        orden = np.argsort(propuesta, kind="stable")
+        puntos, dias, propuesta = puntos[orden], dias[orden], propuesta[orden]
+
+    return asignaciones
+
+def etiquetas_balanceado_preciso(xy, capacidades, max_iter=100, random_state=42, centroides_iniciales=None):
     """
     Balanced KMeans con reasignación de sobrantes.
-    - Cada día recibe casi la misma cantidad de puntos.
-    - Los sobrantes se distribuyen entre los días existentes.
+    - Cada día recibe exactamente su capacidad.
+    - En cada iteración se llena por costo global creciente y se recalculan centroides.
+    - Se detiene cuando las etiquetas dejan de cambiar.
+    - centroides_iniciales: centros (n_dias, 2) en el plano para arrancar desde un plan previo.
+    Distancias en el plano métrico (no en grados).
     """
-    df = df.copy()
-    coords = df[['Latitud', 'Longitud']].values
-    n_points = len(coords)
-    target_size = n_points // n_dias
-    extra = n_points % n_dias  # puntos sobrantes
+    coords = np.asarray(xy, dtype=float)
+    n_points, n_dias = len(coords), len(capacidades)
 
-    # Inicializar centroides aleatorios
-    centroides = coords[np.random.choice(n_points, n_dias, replace=False)]
-    asignaciones = np.full(n_points, -1)
+    if n_points <= n_dias:
+        return np.arange(n_points, dtype=np.int32)
+
+    # Inicializar centroides aleatorios (reproducibles) o desde el plan previo
+    if centroides_iniciales is not None:
+        centroides = np.array(centroides_iniciales, dtype=float)
+    else:
+        rng = np.random.default_rng(random_state)
+        centroides = coords[rng.choice(n_points, n_dias, replace=False)]
+    asignaciones = None
 
     for _ in range(max_iter):
-        dist = pairwise_distances(coords, centroides)
-        asignaciones[:] = -1
-        usados = set()
-
-        for dia in range(n_dias):
-            candidatos = np.argsort(dist[:, dia])
-            count = 0
-            limite = target_size + (1 if dia < extra else 0)  # distribuir sobrantes
-            for idx in candidatos:
-                if asignaciones[idx] == -1 and count < limite:
-                    asignaciones[idx] = dia
-                    usados.add(idx)
-                    count += 1
+        nuevas = _llenado_balanceado(coords, centroides, capacidades)
+        if asignaciones is not None and np.array_equal(nuevas, asignaciones):
+            break
+        asignaciones = nuevas
 
         # Recalcular centroides
-        for dia in range(n_dias):
-            centroides[dia] = coords[asignaciones == dia].mean(axis=0)
+        conteos = np.bincount(asignaciones, minlength=n_dias)
+        for eje in range(2):
+            centroides[:, eje] = np.bincount(asignaciones, weights=coords[:, eje], minlength=n_dias) / conteos
 
-    # Si aún quedan puntos sin asignar (-1), ponerlos en el cluster más cercano
-    for idx in np.where(asignaciones == -1)[0]:
-        distancias = pairwise_distances([coords[idx]], centroides)[0]
-        asignaciones[idx] = np.argmin(distancias)
+    return asignaciones.astype(np.int32)
 
-    df['Dia'] = asignaciones.astype(int)
-    return df
+def asignar_balanceado_preciso(df, n_dias, max_iter=100, random_state=42, centroides_iniciales=None):
+    """
+    Balanced KMeans sobre df (ver etiquetas_balanceado_preciso).
+    Cada día recibe casi la misma cantidad de puntos (los sobrantes van a los primeros días).
+    """
+    xy, _ = coordenadas_plano(df)
+    etiquetas = etiquetas_balanceado_preciso(
+        xy, capacidades_por_dia(len(xy), n_dias), max_iter, random_state, centroides_iniciales
+    )
+    return _con_columna(df, etiquetas)
 
-def asignar_capacitado(df, n_dias):
+def _asignar_con_capacidad(coords, centroides, capacidades):
+    """
+    Asignación greedy por arrepentimiento (regret) con capacidades exactas, con
+    costo = distancia al centroide (por bloques: nunca se arma la matriz (n, k)).
+    En cada ronda cada punto pendiente propone su día abierto más barato; los
+    puntos con mayor diferencia frente a su segunda opción tienen prioridad y
+    cada día acepta propuestas hasta completar su capacidad. Los rechazados
+    vuelven a proponer en la siguiente ronda (a lo sumo k + 1 rondas).
+    """
+    n_points, n_dias = len(coords), len(centroides)
+    asignaciones = np.full(n_points, -1)
+    restante = np.asarray(capacidades).copy()
+    pendientes = np.arange(n_points)
+
+    while len(pendientes):
+        abiertos = np.flatnonzero(restante > 0)
+        pos, primera, segunda = dos_centros_mas_cercanos(coords[pendientes], centroides[abiertos])
+        regret = segunda - primera if len(abiertos) > 1 else np.zeros(len(pendientes))
+        mejor = abiertos[pos]
+
+        # Orden por día y, dentro del día, por arrepentimiento descendente
+        orden = np.lexsort((-regret, mejor))
+        dia_ord = mejor[orden]
+        posicion = np.arange(len(orden)) - np.searchsorted(dia_ord, dia_ord, side="left")
+        acepta = posicion < restante[dia_ord]
+
+        asignaciones[pendientes[orden[acepta]]] = dia_ord[acepta]
+        restante -= np.bincount(dia_ord[acepta], minlength=n_dias)
+        pendientes = np.sort(pendientes[orden[~acepta]])
+
+    return asignaciones
+
+def etiquetas_capacitado(xy, capacidades, max_iter=20, random_state=42, centroides_iniciales=None):
     """
     Opción 2: Capacitated Clustering (Capacitated Voronoi).
-    - Cada cluster tiene una capacidad máxima (puntos por día).
-    - Los puntos se asignan al centroide más cercano, pero respetando la capacidad.
+    - Cada día recibe exactamente su capacidad.
+    - Asignación global por arrepentimiento sobre distancias en el plano métrico.
+    - Refinamiento tipo Lloyd: se recalculan centroides hasta que las etiquetas no cambian.
+    - centroides_iniciales: centros (n_dias, 2) en el plano para arrancar desde un plan previo.
     """
-    df = df.copy()
-    coords = df[['Latitud', 'Longitud']].values
-    n_points = len(coords)
-    capacidad = n_points // n_dias
+    coords = np.asarray(xy, dtype=float)
+    n_points, n_dias = len(coords), len(capacidades)
 
-    # Inicializar centroides aleatorios
-    centroides = coords[np.random.choice(n_points, n_dias, replace=False)]
-    asignaciones = np.full(n_points, -1)
+    if n_points <= n_dias:
+        return np.arange(n_points, dtype=np.int32)
 
-    for idx, punto in enumerate(coords):
-        distancias = [geodesic(punto, c).meters for c in centroides]
-        orden = np.argsort(distancias)
-        for dia in orden:
-            if (asignaciones == dia).sum() < capacidad:
-                asignaciones[idx] = dia
-                break
+    if centroides_iniciales is not None:
+        centroides = np.array(centroides_iniciales, dtype=float)
+    else:
+        centroides, _ = kmeans_plusplus(coords, n_dias, random_state=random_state)
+    asignaciones = None
 
-    df['Dia'] = asignaciones
-    return df
+    for _ in range(max_iter):
+        nuevas = _asignar_con_capacidad(coords, centroides, capacidades)
+        if asignaciones is not None and np.array_equal(nuevas, asignaciones):
+            break
+        asignaciones = nuevas
 
-def asignar_sweep(df, n_dias, esquina="NO"):
+        # Recalcular centroides
+        conteos = np.bincount(asignaciones, minlength=n_dias)
+        for eje in range(2):
+            centroides[:, eje] = np.bincount(asignaciones, weights=coords[:, eje], minlength=n_dias) / conteos
+
+    return asignaciones.astype(np.int32)
+
+def asignar_capacitado(df, n_dias, max_iter=20, random_state=42, centroides_iniciales=None):
+    """
+    Capacitated Clustering sobre df (ver etiquetas_capacitado).
+    Cada día recibe exactamente n // n_dias puntos, sobrantes a los primeros días.
+    """
+    xy, _ = coordenadas_plano(df)
+    etiquetas = etiquetas_capacitado(
+        xy, capacidades_por_dia(len(xy), n_dias), max_iter, random_state, centroides_iniciales
+    )
+    return _con_columna(df, etiquetas)
+
+# Orden del barrido por esquina: (y descendente, x descendente) en el plano
+_ESQUINAS = {"NO": (True, False), "NE": (True, True), "SO": (False, False), "SE": (False, True)}
+
+def etiquetas_sweep(xy, capacidades, esquina="NO"):
     """
     Sweep con agrupamiento espacial:
-    - Recorre desde una esquina.
+    - Recorre desde una esquina (norte/sur primero, luego oeste/este).
     - Agrupa por cercanía.
     - Asigna bloques sin cruces.
     """
-    df = df.copy()
-    n_points = len(df)
-    target_size = n_points // n_dias
-    extra = n_points % n_dias
-
-    # Ordenar puntos según esquina
-    if esquina == "NO":
-        df = df.sort_values(by=["Latitud", "Longitud"], ascending=[False, True])
-    elif esquina == "NE":
-        df = df.sort_values(by=["Latitud", "Longitud"], ascending=[False, False])
-    elif esquina == "SO":
-        df = df.sort_values(by=["Latitud", "Longitud"], ascending=[True, True])
-    elif esquina == "SE":
-        df = df.sort_values(by=["Latitud", "Longitud"], ascending=[True, False])
-
-    df["Dia"] = -1
-    usados = set()
-    coords = df[["Latitud", "Longitud"]].values
+    xy = np.asarray(xy, dtype=float)
+    n_points = len(xy)
 
-    for dia in range(n_dias):
-        limite = target_size + (1 if dia < extra else 0)
-        candidatos = df[~df.index.isin(usados)].copy()
+    # Ordenar puntos según esquina (en el plano, y sigue a la latitud y x a la longitud)
+    y_desc, x_desc = _ESQUINAS[esquina]
+    orden = np.lexsort((-xy[:, 0] if x_desc else xy[:, 0], -xy[:, 1] if y_desc else xy[:, 1]))
 
-        if len(candidatos) <= limite:
-            df.loc[candidatos.index, "Dia"] = dia
+    # 👉 Índice espacial en metros: vecinos disponibles sin recorrer todas las coordenadas
+    indice = IndiceVecinos(xy[orden])
+    asignaciones = np.full(n_points, -1, dtype=np.int32)
+    inicio = 0  # posición en el orden del barrido
+
+    for dia, limite in enumerate(capacidades):
+        if indice.n_disponibles <= limite:
+            asignaciones[indice.disponibles()] = dia
             break
 
-        # Tomar punto inicial del bloque
-        punto_inicio = candidatos.iloc[0][["Latitud", "Longitud"]].values
-        candidatos["distancia"] = candidatos.apply(
-            lambda r: geodesic(punto_inicio, (r["Latitud"], r["Longitud"])).meters,
-            axis=1
-        )
+        # Tomar punto inicial del bloque: el primero libre según la esquina
+        while not indice.disponible[inicio]:
+            inicio += 1
 
-        seleccionados = candidatos.nsmallest(limite, "distancia")
-        df.loc[seleccionados.index, "Dia"] = dia
-        usados.update(seleccionados.index)
+        _, seleccionados = indice.vecinos(indice.coords[inicio], limite)
+        asignaciones[seleccionados] = dia
+        indice.retirar(seleccionados)
 
-    return df
-from sklearn.cluster import KMeans
-import numpy as np
-import pandas as pd
+    etiquetas = np.empty(n_points, dtype=np.int32)
+    etiquetas[orden] = asignaciones
+    return etiquetas
 
-def asignar_por_kmeans(df, cantidades, max_iter=100):
-    df = df.copy()
-    df["Dia"] = -1
+def asignar_sweep(df, n_dias, esquina="NO"):
+    """Sweep sobre df (ver etiquetas_sweep); las filas conservan su orden."""
+    xy, _ = coordenadas_plano(df)
+    return _con_columna(df, etiquetas_sweep(xy, capacidades_por_dia(len(xy), n_dias), esquina))
+
+def etiquetas_kms(xy, cantidades, max_iter=100):
+    """
+    KMeans y, en cada cluster, los `cantidades[dia]` puntos más cercanos a su
+    centro; los sobrantes se reparten después (ver redistribuir_sobrantes).
+    """
+    xy = np.asarray(xy, dtype=float)
     n_dias = len(cantidades)
+    dias = np.full(len(xy), -1, dtype=np.int32)
 
     # 👉 KMeans inicial
-    coords = df[["Latitud", "Longitud"]].values
-    kmeans = KMeans(n_clusters=n_dias, n_init=10, max_iter=max_iter, random_state=42)
-    df["cluster"] = kmeans.fit_predict(coords)
+    cluster, _ = agrupar_kmeans(xy, n_dias, n_init=10, max_iter=max_iter, random_state=42)
 
     # 👉 Asignar por cercanía al centroide de cada cluster
-    usados = set()
     for dia in range(n_dias):
-        grupo = df[df["cluster"] == dia].copy()
-        if grupo.empty:
+        en_cluster = np.flatnonzero(cluster == dia)
+        if len(en_cluster) == 0:
             continue
-        c_lat, c_lon = grupo["Latitud"].mean(), grupo["Longitud"].mean()
-        grupo["dist"] = np.sqrt((grupo["Latitud"] - c_lat)**2 + (grupo["Longitud"] - c_lon)**2)
-        seleccionados = grupo.sort_values("dist").head(cantidades[dia])
-        df.loc[seleccionados.index, "Dia"] = dia
-        usados.update(seleccionados.index)
+        centro = xy[en_cluster].mean(axis=0)
+        dist = distancias_plano(xy[en_cluster], centro[None])[:, 0]
+        dias[en_cluster[np.argsort(dist, kind="stable")[:cantidades[dia]]]] = dia
 
     # 👉 Redistribuir sobrantes
-    df = redistribuir_sobrantes(df, cantidades)
-    return df
+    return _redistribuir(xy, dias, cantidades)
 
-def redistribuir_sobrantes(df, cantidades):
-    df = df.copy()
-    no_asignados = df[df["Dia"] == -1]
-    if no_asignados.empty:
-        return df
+def asignar_por_kmeans(df, cantidades, max_iter=100):
+    xy, _ = coordenadas_plano(df)
+    return _con_columna(df, etiquetas_kms(xy, cantidades, max_iter))
+
+def _redistribuir(coords, dias, cantidades):
+    """Cada día con faltante toma los puntos sin asignar (-1) más cercanos a su centro."""
+    pendientes = np.flatnonzero(dias == -1)
+    if len(pendientes) == 0:
+        return dias
+    dias = dias.copy()
 
     # Centroide por día
+    asignados = dias >= 0
     centroides = {}
     for dia in range(len(cantidades)):
-        g = df[df["Dia"] == dia]
-        if g.empty:
-            centroides[dia] = (df["Latitud"].mean(), df["Longitud"].mean())
+        g = coords[dias == dia]
+        if len(g) == 0:
+            centroides[dia] = coords.mean(axis=0)
         else:
-            centroides[dia] = (g["Latitud"].mean(), g["Longitud"].mean())
+            centroides[dia] = g.mean(axis=0)
 
     # Conteo actual
-    counts = df[df["Dia"] != -1]["Dia"].value_counts().to_dict()
+    counts = np.bincount(dias[asignados], minlength=len(cantidades))
 
-    # Asignar sobrantes por cercanía
+    # 👉 Índice sobre los no asignados: cada día toma sus vecinos libres más cercanos
+    indice = IndiceVecinos(coords[pendientes])
     for dia, esperado in enumerate(cantidades):
-        falta = esperado - counts.get(dia, 0)
-        if falta <= 0 or no_asignados.empty:
+        falta = esperado - counts[dia]
+        if falta <= 0 or indice.n_disponibles == 0:
             continue
-        c_lat, c_lon = centroides[dia]
-        tmp = no_asignados.copy()
-        tmp["dist"] = np.sqrt((tmp["Latitud"] - c_lat)**2 + (tmp["Longitud"] - c_lon)**2)
-        mov = tmp.sort_values("dist").head(falta)
-        df.loc[mov.index, "Dia"] = dia
-        no_asignados = no_asignados.drop(mov.index)
+        _, mov = indice.vecinos(centroides[dia], falta)
+        dias[pendientes[mov]] = dia
+        indice.retirar(mov)
 
-    return df
+    return dias
+
+def redistribuir_sobrantes(df, cantidades):
+    coords, _ = coordenadas_plano(df)
+    dias = df["Dia"].to_numpy()
+    if not (dias == -1).any():
+        return df.copy()
+    return _con_columna(df, _redistribuir(coords, dias, cantidades))
@@ -0,0 +1,35 @@
+import streamlit as st
+
+
+def descarga_bajo_demanda(etiqueta, clave, generar, file_name, mime, huella):
+    """
+    Botón de descarga que solo genera el archivo cuando el usuario lo pide.
+    - generar: función sin argumentos que devuelve los bytes del archivo.
+    - huella: identifica los datos; mientras no cambie, el archivo generado se
+      reutiliza entre reruns sin volver a construirlo.
+    En la sesión solo quedan archivos de los datos actuales: al cambiar la huella
+    se descartan los generados con datos anteriores.
+    """
+    guardados = st.session_state.setdefault("_descargas", {})
+    entrada = guardados.get(clave)
+
+    if entrada is not None and entrada[0] != huella:
+        del guardados[clave]  # 👉 archivo de datos anteriores: se libera ya
+        entrada = None
+
+    if entrada is None:
+        if not st.button(f"⚙️ Preparar: {etiqueta}", key=f"preparar_{clave}"):
+            return
+        with st.spinner("Generando archivo..."):
+            entrada = (huella, generar())
+        for otra in [c for c, (h, _) in guardados.items() if h != huella]:
+            del guardados[otra]
+        guardados[clave] = entrada
+
+    st.download_button(
+        label=etiqueta,
+        data=entrada[1],
+        file_name=file_name,
+        mime=mime,
+        key=f"descargar_{clave}"
+    )
@@ -1,11 +1,16 @@
+import hashlib
+from collections import OrderedDict
 import folium
 from folium.plugins import Draw, Fullscreen
 from streamlit_folium import st_folium
+import numpy as np
 import pandas as pd
 import matplotlib.cm as cm
 import matplotlib.colors as mcolors
 import streamlit as st
 
+from utils.columnas import columna_contrato
+
 def inject_draw_css():
     st.markdown("""
     <style>
@@ -16,16 +21,115 @@ def inject_draw_css():
     </style>
     """, unsafe_allow_html=True)
 
-def render_colored_map(df, color_by="Dia", key=None, editable=False):
+def _valor_json(valor):
+    """Escalares de NumPy a tipos nativos para poder serializarlos en GeoJSON."""
+    return valor.item() if hasattr(valor, "item") else valor
+
+def _capa_geojson(subset, color_by, cat, color, col_contrato, nombre):
+    """
+    Una sola capa GeoJSON (FeatureCollection) para todos los puntos de una categoría.
+    El estilo es el mismo para toda la capa y el popup se arma en el navegador
+    a partir de las propiedades de cada punto.
+    """
+    if col_contrato:
+        contratos = [
+            str(c) if pd.notna(c) else "Sin dato"
+            for c in subset[col_contrato].tolist()
+        ]
+    else:
+        contratos = ["Sin dato"] * len(subset)
+
+    valor = _valor_json(cat)
+    campos = [color_by, "Contrato"]
+    ordenes = [None] * len(subset)
+    if "Orden" in subset.columns:
+        campos.append("Orden")
+        ordenes = [_valor_json(o) for o in subset["Orden"].tolist()]
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {color_by: valor, "Contrato": contrato, "Orden": orden},
+        }
+        for lat, lon, contrato, orden in zip(
+            # 6 decimales (~0.1 m) bastan y reducen el HTML
+            subset["Latitud"].round(6).tolist(), subset["Longitud"].round(6).tolist(), contratos, ordenes
+        )
+    ]
+
+    return folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=nombre,
+        marker=folium.CircleMarker(radius=6, fill=True),
+        style_function=lambda _, c=color: {
+            "color": c, "fillColor": c, "fill": True, "fillOpacity": 0.2, "weight": 3
+        },
+        popup=folium.GeoJsonPopup(fields=campos, aliases=campos),
+    )
+
+def _linea_ruta(subset, color):
+    """PolyLine con el orden de visita de una categoría (columna 'Orden')."""
+    ruta = subset[subset["Orden"] > 0].sort_values("Orden")
+    if len(ruta) < 2:
+        return None
+    return folium.PolyLine(
+        ruta[["Latitud", "Longitud"]].round(6).to_numpy().tolist(),
+        color=color, weight=2, opacity=0.7
+    )
+
+MAX_MAPAS_CACHE = 4
+
+def _clave_mapa(df, color_by, editable, modo):
+    """Hash de (coordenadas, etiquetas, orden de visita, contratos, color_by, editable, modo)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((color_by, editable, modo, len(df))).encode())
+    h.update(np.ascontiguousarray(df[["Latitud", "Longitud"]].to_numpy(dtype=float)).tobytes())
+    h.update(pd.util.hash_pandas_object(df[color_by], index=False).to_numpy().tobytes())
+    if "Orden" in df.columns:
+        h.update(pd.util.hash_pandas_object(df["Orden"], index=False).to_numpy().tobytes())
+    col_contrato = columna_contrato(df)
+    if col_contrato:
+        h.update(pd.util.hash_pandas_object(df[col_contrato], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def render_colored_map(df, color_by="Dia", key=None, editable=False, modo="geojson"):
+    """
+    Mapa coloreado por `color_by`, con una capa por categoría.
+    - modo="geojson": una FeatureCollection por categoría sobre canvas (rápido con miles de puntos).
+    - modo="marcadores": un CircleMarker por punto (comportamiento anterior).
+    El mapa construido se guarda por sesión: si los puntos y etiquetas no cambiaron
+    se reutiliza en lugar de reconstruirlo en cada rerun.
+    Con editable=True el mismo mapa sirve de vista y de herramienta de dibujo.
+    Si existe la columna 'Orden' se dibuja además la ruta de cada categoría.
+    """
     if color_by not in df.columns:
         st.warning(f"⚠️ La columna '{color_by}' no existe en el DataFrame.")
         return None
 
+    cache = st.session_state.setdefault("_cache_mapas", OrderedDict())
+    clave = _clave_mapa(df, color_by, editable, modo)
+    m = cache.get(clave)
+    if m is None:
+        m = _construir_mapa(df, color_by, editable, modo)
+        cache[clave] = m
+        while len(cache) > MAX_MAPAS_CACHE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(clave)
+
+    if editable:
+        inject_draw_css()
+
+    return st_folium(m, width=700, height=500, key=key)
+
+def _construir_mapa(df, color_by, editable, modo):
 #    m = folium.Map(location=[df['Latitud'].mean(), df['Longitud'].mean()], zoom_start=12)
     m = folium.Map(
         location=[df['Latitud'].mean(), df['Longitud'].mean()],
         zoom_start=12,
-        tiles="CartoDB positron"   # puedes cambiar a "CartoDB dark_matter" para modo oscuro )
+        tiles="CartoDB positron",   # puedes cambiar a "CartoDB dark_matter" para modo oscuro )
+        prefer_canvas=(modo == "geojson")
     )
 
     Fullscreen().add_to(m)
@@ -74,19 +178,32 @@ def render_colored_map(df, color_by="Dia", key=None, editable=False):
         for i, cat in enumerate(categorias_unicas)
     }
 
-    # Normalizar nombres de columnas para encontrar "Contrato"
-    normalized_cols = {c.lower().replace(" ", ""): c for c in df.columns}
-    col_contrato = next((original for norm, original in normalized_cols.items() if "contrato" in norm), None)
+    col_contrato = columna_contrato(df)
 
     for cat, color in colores_map.items():
         subset = df[df[color_by] == cat]
         cantidad = len(subset)
         # ✅ Ya no sumamos +1 aquí, porque aplicar_algoritmo lo hace
-        grupo = folium.FeatureGroup(name=f"{color_by} {cat} ({cantidad})")
+        nombre_capa = f"{color_by} {cat} ({cantidad})"
+
+        # 👉 Ruta de visita de la categoría (si ya se calculó el orden)
+        linea = _linea_ruta(subset, color) if "Orden" in df.columns else None
+
+        if modo == "geojson":
+            capa = _capa_geojson(subset, color_by, cat, color, col_contrato, nombre_capa)
+            if linea is not None:
+                # Puntos y ruta en un mismo grupo para encenderlos/apagarlos juntos
+                capa = folium.FeatureGroup(name=nombre_capa).add_child(capa).add_child(linea)
+            capa.add_to(m)
+            continue
+
+        grupo = folium.FeatureGroup(name=nombre_capa)
 
         for _, row in subset.iterrows():
             contrato_text = f"Contrato: {row[col_contrato]}" if col_contrato and pd.notna(row[col_contrato]) else "Contrato: Sin dato"
             popup_text = f"{color_by}: {cat}<br>{contrato_text}"
+            if "Orden" in df.columns:
+                popup_text += f"<br>Orden: {row['Orden']}"
             folium.CircleMarker(
                 [row['Latitud'], row['Longitud']],
                 radius=6,
@@ -94,6 +211,8 @@ def render_colored_map(df, color_by="Dia", key=None, editable=False):
                 fill=True,
                 popup=popup_text
             ).add_to(grupo)
+        if linea is not None:
+            linea.add_to(grupo)
         grupo.add_to(m)
 
     folium.LayerControl(collapsed=False).add_to(m)
@@ -119,9 +238,7 @@ def render_colored_map(df, color_by="Dia", key=None, editable=False):
             edit_options={"edit": True, "remove": True}
         ).add_to(m)
 
-        inject_draw_css()
-
-    return st_folium(m, width=700, height=500, key=key)
+    return m
 
 
 def render_map(df):
@@ -132,9 +249,7 @@ def render_map(df):
     m = folium.Map(location=[df['Latitud'].mean(), df['Longitud'].mean()], zoom_start=12)
     Fullscreen().add_to(m)
 
-    # Normalizar nombres de columnas para encontrar "Contrato"
-    normalized_cols = {c.lower().replace(" ", ""): c for c in df.columns}
-    col_contrato = next((original for norm, original in normalized_cols.items() if "contrato" in norm), None)
+    col_contrato = columna_contrato(df)
 
     for _, row in df.iterrows():
         contrato_text = f"Contrato: {row[col_contrato]}" if col_contrato and pd.notna(row[col_contrato]) else "Contrato: Sin dato"
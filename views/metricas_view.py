@@ -0,0 +1,61 @@
+import numpy as np
+import streamlit as st
+
+from utils.metricas import metricas_df
+
+
+def mostrar_metricas(df, columna="Dia", cantidades=None, titulo="📐 Métricas del plan"):
+    """
+    Costo (mismos términos que evaluate_cost), dispersión y ruta estimada por grupo.
+    Devuelve (MetricasPlan, categorías) para reutilizarlo en la vista previa de ediciones.
+    """
+    if columna not in df.columns or df.empty:
+        return None, []
+
+    metricas, categorias = metricas_df(df, columna, cantidades)
+    terminos = metricas.terminos()
+
+    st.subheader(titulo)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Costo", f"{terminos['costo']:.2f}")
+    c2.metric("Desbalance", terminos["desbalance"])
+    c3.metric("Cruce (°)", f"{terminos['cruce']:.4f}")
+    c4.metric("Ruta estimada", f"{terminos['ruta_estimada_m'] / 1000:.1f} km")
+
+    tabla = metricas.por_grupo()
+    tabla["Grupo"] = categorias
+    st.dataframe(
+        tabla.rename(columns={"Grupo": columna}).round(
+            {"Dispersion_m": 0, "Area_km2": 2, "Ruta_estimada_m": 0}
+        ),
+        use_container_width=True
+    )
+    return metricas, categorias
+
+
+def vista_previa_reasignacion(df, metricas, categorias, indices, destino):
+    """
+    Muestra cómo cambiaría el costo si los puntos `indices` (etiquetas del índice
+    de df) pasan al grupo `destino`, con una actualización incremental del plan.
+    """
+    if metricas is None:
+        return
+    if destino not in categorias:
+        st.caption(f"'{destino}' es un grupo nuevo: el costo se recalculará al guardar.")
+        return
+
+    antes = metricas.terminos()
+    posiciones = df.index.get_indexer(indices)
+    previas = metricas.etiquetas[posiciones].copy()
+
+    metricas.mover(posiciones, categorias.index(destino))
+    despues = metricas.terminos()
+
+    # Deshacer: el mismo objeto sigue describiendo el plan guardado
+    for codigo in np.unique(previas):
+        metricas.mover(posiciones[previas == codigo], int(codigo))
+
+    st.metric(
+        "Costo tras reasignar", f"{despues['costo']:.2f}",
+        delta=f"{despues['costo'] - antes['costo']:+.2f}", delta_color="inverse"
+    )
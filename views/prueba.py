@@ -1,7 +1,9 @@
 import numpy as np
 import pandas as pd
 import random
-from sklearn.cluster import KMeans
+from concurrent.futures import ProcessPoolExecutor
+from utils.agrupamiento import agrupar_kmeans
+from utils.distancias import bloques_filas, coordenadas_plano, metros_por_grado
 
 # ------------------------------
 # Funciones auxiliares de evaluación
@@ -63,58 +65,287 @@ def evaluate_cost(df, cantidades, alpha=1.0, beta=3.0, gamma=2.0):
     return alpha * dispersion + beta * cruce + gamma * desbalance + unassigned_penalty
 
 # ------------------------------
-# Algoritmo híbrido KMeans + Evolutivo
+# Evaluación vectorizada de toda la población
 # ------------------------------
-def asignar_por_kmeans_evolutivo(df, cantidades, n_generations=50, population_size=20,
-                                 alpha=1.0, beta=3.0, gamma=2.0, mutation_sigma=0.001):
-    df = df.copy()
-    n_dias = len(cantidades)
-    coords = df[["Latitud", "Longitud"]].values
+def asignar_poblacion(coords, poblacion, max_elementos=2_000_000):
+    """
+    Asigna cada punto a su centroide más cercano para todos los individuos a la vez.
+    - coords: arreglo (n, 2) de puntos en el plano métrico (x, y en metros).
+    - poblacion: arreglo (P, k, 2) con los centroides de cada individuo, en el mismo plano.
+    Devuelve etiquetas (P, n). Los puntos se procesan por bloques para que el
+    tensor (P × bloque × k) no supere `max_elementos`.
+    """
+    poblacion = np.asarray(poblacion, dtype=float)
+    n_ind, k, _ = poblacion.shape
+    n = len(coords)
+    etiquetas = np.empty((n_ind, n), dtype=np.int32)
 
-    # 👉 Inicialización con KMeans
-    kmeans = KMeans(n_clusters=n_dias, n_init=10, random_state=42)
-    df["Dia"] = kmeans.fit_predict(coords)
-    centroids = kmeans.cluster_centers_
+    for ini, fin in bloques_filas(n, n_ind * k, max_elementos):
+        diff = coords[None, ini:fin, None, :] - poblacion[:, None, :, :]
+        dists = np.sqrt(np.einsum("pbkc,pbkc->pbk", diff, diff))
+        etiquetas[:, ini:fin] = dists.argmin(axis=2)
+    return etiquetas
+
+
+def _extremos_por_grupo(claves, valores, n_grupos):
+    """
+    Mínimo y máximo de `valores` por grupo (NaN en los grupos vacíos),
+    usando un único ordenamiento y reducciones `reduceat`.
+    """
+    orden = np.argsort(claves, kind="stable")
+    claves_ord = claves[orden]
+    valores_ord = valores[orden]
+    inicios = np.flatnonzero(np.r_[True, claves_ord[1:] != claves_ord[:-1]])
+    grupos = claves_ord[inicios]
+
+    minimos = np.full(n_grupos, np.nan)
+    maximos = np.full(n_grupos, np.nan)
+    minimos[grupos] = np.minimum.reduceat(valores_ord, inicios)
+    maximos[grupos] = np.maximum.reduceat(valores_ord, inicios)
+    return minimos, maximos
+
+
+def evaluate_cost_poblacion(coords, etiquetas, cantidades, alpha=1.0, beta=3.0, gamma=2.0):
+    """
+    Misma función de costo que `evaluate_cost`, calculada para toda la población
+    a partir de las etiquetas (P, n) en lugar de un DataFrame por individuo.
+    - coords: [Latitud, Longitud] en grados; los pesos alpha/beta/gamma están
+      calibrados para áreas y solapamientos en grados.
+    Devuelve un arreglo (P,) con el costo de cada individuo.
+    """
+    n_ind, n = etiquetas.shape
+    k = len(cantidades)
+
+    # 👉 Una clave por (individuo, día) para reducir todo en una sola pasada
+    claves = (etiquetas + (np.arange(n_ind) * k)[:, None]).ravel()
+    conteos = np.bincount(claves, minlength=n_ind * k).reshape(n_ind, k)
+    lat_min, lat_max = _extremos_por_grupo(claves, np.tile(coords[:, 0], n_ind), n_ind * k)
+    lon_min, lon_max = _extremos_por_grupo(claves, np.tile(coords[:, 1], n_ind), n_ind * k)
+    lat_min, lat_max = lat_min.reshape(n_ind, k), lat_max.reshape(n_ind, k)
+    lon_min, lon_max = lon_min.reshape(n_ind, k), lon_max.reshape(n_ind, k)
+
+    # Las sumas se acumulan día por día, en el mismo orden que evaluate_cost
+    dispersion = np.zeros(n_ind)
+    for dia in range(k):
+        area = (lat_max[:, dia] - lat_min[:, dia]) * (lon_max[:, dia] - lon_min[:, dia])
+        dispersion += np.where(conteos[:, dia] == 0, 1.0, area)
+
+    # Cruce: rangos ordenados por longitud mínima (los días vacíos quedan al final)
+    orden = np.argsort(lon_min, axis=1, kind="stable")
+    izq = np.take_along_axis(lon_min, orden, axis=1)
+    der = np.take_along_axis(lon_max, orden, axis=1)
+    cruce = np.zeros(n_ind)
+    for i in range(k - 1):
+        l2, r1 = izq[:, i + 1], der[:, i]
+        cruce += np.where(l2 < r1, r1 - l2, 0.0)
+
+    desbalance = np.zeros(n_ind, dtype=np.int64)
+    for dia, esperado in enumerate(cantidades):
+        desbalance += np.abs(esperado - conteos[:, dia])
+
+    # Con asignación al centroide más cercano no quedan puntos sin asignar
+    unassigned_penalty = 0.0
+
+    return alpha * dispersion + beta * cruce + gamma * desbalance + unassigned_penalty
+
+# ------------------------------
+# Ejecución en paralelo (pool de procesos)
+# ------------------------------
+_COORDS_TRABAJADOR = None
+
+
+def _iniciar_trabajador(coords):
+    """
+    Guarda las coordenadas en cada proceso para no reenviarlas en cada tarea.
+    - coords: tupla (grados, plano) de arreglos (n, 2).
+    """
+    global _COORDS_TRABAJADOR
+    _COORDS_TRABAJADOR = coords
+
+
+def _evaluar_bloque(args):
+    poblacion, cantidades, alpha, beta, gamma = args
+    grados, plano = _COORDS_TRABAJADOR
+    etiquetas = asignar_poblacion(plano, poblacion)
+    return evaluate_cost_poblacion(grados, etiquetas, cantidades, alpha, beta, gamma)
+
+
+def _evaluar_poblacion(poblacion, coords, cantidades, alpha, beta, gamma, pool=None, n_workers=1):
+    """
+    Costo de cada individuo.
+    - coords: tupla (grados, plano); la asignación usa el plano métrico y el costo los grados.
+    Con `pool`, la población se reparte en bloques entre los procesos; el
+    resultado es idéntico al de la evaluación en serie.
+    """
+    if pool is None:
+        grados, plano = coords
+        etiquetas = asignar_poblacion(plano, poblacion)
+        return evaluate_cost_poblacion(grados, etiquetas, cantidades, alpha, beta, gamma)
 
-    # 👉 Población inicial: centroides perturbados
-    population = []
-    for _ in range(population_size):
-        noise = np.random.normal(0, mutation_sigma, size=centroids.shape)
-        population.append(centroids + noise)
+    bloques = [b for b in np.array_split(poblacion, n_workers) if len(b)]
+    tareas = [(b, cantidades, alpha, beta, gamma) for b in bloques]
+    return np.concatenate(list(pool.map(_evaluar_bloque, tareas)))
 
-    best_df, best_cost = None, float("inf")
+
+def _evolucionar(population, n_generations, mutation_sigma, evaluar, normal, elegir, escala=1.0):
+    """
+    Bucle evolutivo: evaluación, elitismo y mutación gaussiana.
+    - evaluar: función población (P, k, 2) -> costos (P,).
+    - normal / elegir: fuentes de aleatoriedad (globales o de un generador con semilla).
+    - escala: factor por eje de la mutación (metros por grado si los centroides
+      están en el plano y mutation_sigma en grados).
+    Devuelve (población final, mejores centroides, mejor costo, historial).
+    """
+    population_size = len(population)
+    best, best_cost = None, float("inf")
     history = []
 
     for gen in range(n_generations):
-        scored = []
-        for centroids in population:
-            # Asignar cada punto al centroide más cercano
-            asignaciones = []
-            for i, row in df.iterrows():
-                dists = np.linalg.norm(centroids - np.array([row["Latitud"], row["Longitud"]]), axis=1)
-                asignaciones.append(np.argmin(dists))
-            df["Dia"] = asignaciones
-
-            # Evaluar costo
-            cost = evaluate_cost(df, cantidades, alpha, beta, gamma)
-            scored.append((centroids, cost, df.copy()))
-
-        # Ordenar por costo
-        scored.sort(key=lambda x: x[1])
-        elites = scored[:max(1, population_size // 4)]
+        costos = evaluar(np.stack(population))
+
+        # Ordenar por costo (estable, igual que la versión fila por fila)
+        orden = np.argsort(costos, kind="stable")
+        elites = orden[:max(1, population_size // 4)]
 
         # Guardar mejor
-        if elites[0][1] < best_cost:
-            best_cost = elites[0][1]
-            best_df = elites[0][2]
+        if costos[elites[0]] < best_cost:
+            best_cost = float(costos[elites[0]])
+            best = population[elites[0]]
         history.append(best_cost)
 
         # Nueva población: elitismo + mutaciones
-        new_pop = [e[0] for e in elites]
+        new_pop = [population[i] for i in elites]
         while len(new_pop) < population_size:
-            parent = random.choice(elites)[0]
-            child = parent + np.random.normal(0, mutation_sigma, size=parent.shape)
+            parent = population[elegir(elites)]
+            child = parent + normal(0, mutation_sigma, size=parent.shape) * escala
             new_pop.append(child)
         population = new_pop
 
+    return population, best, best_cost, history
+
+
+def _fuentes_aleatorias(rng):
+    """(normal, elegir) de un generador de NumPy."""
+    return rng.normal, lambda seq: seq[rng.integers(len(seq))]
+
+
+def _evolucionar_isla(args, coords=None):
+    population, semilla, n_generations, cantidades, alpha, beta, gamma, mutation_sigma, escala = args
+    coords = _COORDS_TRABAJADOR if coords is None else coords
+    normal, elegir = _fuentes_aleatorias(np.random.default_rng(semilla))
+    evaluar = lambda pob: _evaluar_poblacion(pob, coords, cantidades, alpha, beta, gamma)
+    return _evolucionar(population, n_generations, mutation_sigma, evaluar, normal, elegir, escala)
+
+
+def _evolucionar_islas(coords, centroids, cantidades, n_generations, population_size,
+                       alpha, beta, gamma, mutation_sigma, n_islas, migracion_cada,
+                       n_migrantes, random_state, pool, escala=1.0):
+    """
+    Modelo de islas: cada subpoblación evoluciona por separado (un proceso por isla)
+    y cada `migracion_cada` generaciones sus mejores individuos reemplazan a los
+    últimos hijos de la isla siguiente (anillo).
+    Las semillas de cada isla y época se derivan de `random_state`.
+    """
+    semillas = np.random.SeedSequence(random_state).spawn(n_islas)
+    islas = []
+    for semilla in semillas:
+        normal, _ = _fuentes_aleatorias(np.random.default_rng(semilla.spawn(1)[0]))
+        islas.append([centroids + normal(0, mutation_sigma, size=centroids.shape) * escala
+                      for _ in range(population_size)])
+
+    # Los migrantes nunca deben pisar a los élites de la isla destino
+    n_migrantes = min(n_migrantes, population_size - max(1, population_size // 4))
+
+    best, best_cost = None, float("inf")
+    history = []
+    hechas = 0
+    while hechas < n_generations:
+        n_gen = min(migracion_cada, n_generations - hechas)
+        tareas = [
+            (isla, semilla.spawn(1)[0], n_gen, cantidades, alpha, beta, gamma, mutation_sigma, escala)
+            for isla, semilla in zip(islas, semillas)
+        ]
+        if pool is None:
+            resultados = [_evolucionar_isla(t, coords) for t in tareas]
+        else:
+            resultados = list(pool.map(_evolucionar_isla, tareas))
+
+        islas = [r[0] for r in resultados]
+        for _, mejor, costo, _ in resultados:
+            if costo < best_cost:
+                best, best_cost = mejor, costo
+        for g in range(n_gen):
+            previo = history[-1] if history else float("inf")
+            history.append(min(previo, min(r[3][g] for r in resultados)))
+
+        hechas += n_gen
+        if n_migrantes > 0 and hechas < n_generations:
+            migrantes = [[c.copy() for c in isla[:n_migrantes]] for isla in islas]
+            for i in range(n_islas):
+                islas[(i + 1) % n_islas][-n_migrantes:] = migrantes[i]
+
+    return best, best_cost, history
+
+# ------------------------------
+# Algoritmo híbrido KMeans + Evolutivo
+# ------------------------------
+def asignar_por_kmeans_evolutivo(df, cantidades, n_generations=50, population_size=20,
+                                 alpha=1.0, beta=3.0, gamma=2.0, mutation_sigma=0.001,
+                                 n_workers=1, n_islas=1, migracion_cada=10, n_migrantes=1,
+                                 random_state=None):
+    """
+    KMeans como semilla + evolución de centroides.
+    - n_workers: procesos para evaluar la población (1 = en serie).
+    - n_islas: subpoblaciones independientes que migran élites cada `migracion_cada` generaciones.
+    - random_state: semilla; con None se usa el generador global (comportamiento histórico).
+      Con semilla fija el resultado no depende de n_workers.
+    Los centroides viven en el plano métrico (la asignación no se deforma este-oeste);
+    mutation_sigma sigue en grados y se convierte a metros por eje. El costo se
+    mide en grados, como en evaluate_cost.
+    """
+    n_dias = len(cantidades)
+    grados = df[["Latitud", "Longitud"]].to_numpy(dtype=float)
+    plano, origen = coordenadas_plano(df)
+    coords = (grados, plano)
+    escala = metros_por_grado(origen)
+
+    # 👉 Inicialización con KMeans
+    _, centroids = agrupar_kmeans(plano, n_dias, n_init=10, random_state=42)
+
+    pool = None
+    if n_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=n_workers, initializer=_iniciar_trabajador,
+                                   initargs=(coords,))
+    try:
+        if n_islas > 1:
+            best, best_cost, history = _evolucionar_islas(
+                coords, centroids, cantidades, n_generations, population_size,
+                alpha, beta, gamma, mutation_sigma, n_islas, migracion_cada,
+                n_migrantes, random_state, pool, escala
+            )
+        else:
+            if random_state is None:
+                normal, elegir = np.random.normal, random.choice
+            else:
+                normal, elegir = _fuentes_aleatorias(np.random.default_rng(random_state))
+
+            # 👉 Población inicial: centroides perturbados
+            population = []
+            for _ in range(population_size):
+                noise = normal(0, mutation_sigma, size=centroids.shape) * escala
+                population.append(centroids + noise)
+
+            evaluar = lambda pob: _evaluar_poblacion(pob, coords, cantidades, alpha, beta, gamma,
+                                                     pool=pool, n_workers=n_workers)
+            _, best, best_cost, history = _evolucionar(population, n_generations, mutation_sigma,
+                                                       evaluar, normal, elegir, escala)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    best_df = None
+    if best is not None:
+        best_df = df.copy(deep=False)
+        best_df["Dia"] = asignar_poblacion(plano, best[None])[0]
+
     return best_df, {"mejor_costo": best_cost, "historial_costos": history}
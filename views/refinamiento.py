@@ -0,0 +1,145 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from utils.distancias import coordenadas_plano
+from utils.metricas import codificar_etiquetas
+
+_EPS = 1e-9
+
+
+def refinar_asignacion(xy, etiquetas, capacidades=None, k_vecinos=10, tiempo_max=2.0, max_pasadas=50):
+    """
+    Búsqueda local sobre una asignación ya hecha: mueve puntos de frontera entre
+    grupos vecinos si baja la suma de distancias al cuadrado a los centroides (SSE).
+    - xy: arreglo (n, 2) en metros; etiquetas: códigos 0..k-1 (-1 = sin asignar, no se tocan).
+    - capacidades: puntos por grupo a respetar. Los intercambios (swap) no cambian
+      los tamaños; un traslado (relocate) solo va de un grupo con sobrante a uno
+      con faltante. Por defecto se conservan los tamaños actuales.
+    - k_vecinos: candidatos por punto (grafo k-NN).
+    - tiempo_max: segundos como máximo.
+    Cada pasada filtra en bloque los pares de frontera prometedores y luego los
+    aplica uno a uno con el delta exacto en O(1) sobre sumas y conteos.
+    """
+    limite = time.perf_counter() + tiempo_max
+    xy = np.asarray(xy, dtype=float)
+    etiquetas = np.asarray(etiquetas, dtype=np.int64).copy()
+    n = len(xy)
+    if n < 2 or etiquetas.max(initial=-1) < 1:
+        return etiquetas
+
+    k = int(etiquetas.max()) + 1
+    asignados = etiquetas >= 0
+    conteos = np.bincount(etiquetas[asignados], minlength=k)
+    if capacidades is None:
+        capacidades = conteos.copy()
+    capacidades = np.asarray(capacidades, dtype=np.int64)
+    if len(capacidades) < k:
+        capacidades = np.concatenate([capacidades, conteos[len(capacidades):]])
+    suma = np.column_stack([
+        np.bincount(etiquetas[asignados], weights=xy[asignados, e], minlength=k) for e in range(2)
+    ])
+
+    vecinos = KDTree(xy).query(xy, k=min(k_vecinos + 1, n), return_distance=False)[:, 1:]
+    X, Y = xy[:, 0].tolist(), xy[:, 1].tolist()
+    lista_conteos = conteos.tolist()
+    sx, sy = suma[:, 0].tolist(), suma[:, 1].tolist()
+    lista_cap = capacidades.tolist()
+
+    def dist2_centro(i, g):
+        m = lista_conteos[g]
+        return (X[i] - sx[g] / m) ** 2 + (Y[i] - sy[g] / m) ** 2
+
+    def delta_traslado(p, a, b):
+        # Sale p de a (n_a -> n_a - 1) y entra a b (n_b -> n_b + 1)
+        na, nb = lista_conteos[a], lista_conteos[b]
+        if na <= 1:
+            return np.inf
+        entra = nb / (nb + 1) * dist2_centro(p, b) if nb else 0.0
+        return entra - na / (na - 1) * dist2_centro(p, a)
+
+    def delta_intercambio(p, q, a, b):
+        # p (de a) y q (de b) intercambian grupo: ΔSSE = |q-c|² - |p-c|² - |q-p|²/n en cada grupo
+        d2 = (X[p] - X[q]) ** 2 + (Y[p] - Y[q]) ** 2
+        return (dist2_centro(q, a) - dist2_centro(p, a) - d2 / lista_conteos[a]
+                + dist2_centro(p, b) - dist2_centro(q, b) - d2 / lista_conteos[b])
+
+    def mover(p, a, b):
+        lista_conteos[a] -= 1
+        lista_conteos[b] += 1
+        sx[a] -= X[p]
+        sy[a] -= Y[p]
+        sx[b] += X[p]
+        sy[b] += Y[p]
+        etiquetas[p] = b
+
+    for _ in range(max_pasadas):
+        if time.perf_counter() > limite:
+            break
+
+        # 👉 Pares de frontera (p, q) en grupos distintos, filtrados en bloque
+        la = etiquetas[:, None]
+        lb = etiquetas[vecinos]
+        frontera = (la != lb) & (la >= 0) & (lb >= 0)
+        p_idx, j = np.nonzero(frontera)
+        if len(p_idx) == 0:
+            break
+        q_idx = vecinos[p_idx, j]
+        a, b = etiquetas[p_idx], etiquetas[q_idx]
+
+        centros = np.column_stack([sx, sy]) / np.maximum(lista_conteos, 1)[:, None]
+        # p más cerca del centro de b que del suyo: candidato a traslado o intercambio
+        ganancia = (((xy[p_idx] - centros[a]) ** 2).sum(axis=1)
+                    - ((xy[p_idx] - centros[b]) ** 2).sum(axis=1))
+        prometedores = np.flatnonzero(ganancia > 0)
+        prometedores = prometedores[np.argsort(-ganancia[prometedores], kind="stable")]
+
+        mejoras = 0
+        for c in prometedores.tolist():
+            p, q = int(p_idx[c]), int(q_idx[c])
+            ga, gb = int(etiquetas[p]), int(etiquetas[q])
+            if ga == gb or ga < 0 or gb < 0:
+                continue
+
+            if lista_conteos[ga] > lista_cap[ga] and lista_conteos[gb] < lista_cap[gb]:
+                if delta_traslado(p, ga, gb) < -_EPS:
+                    mover(p, ga, gb)
+                    mejoras += 1
+                    continue
+
+            if delta_intercambio(p, q, ga, gb) < -_EPS:
+                mover(p, ga, gb)
+                mover(q, gb, ga)
+                mejoras += 1
+
+            if mejoras % 256 == 0 and time.perf_counter() > limite:
+                break
+
+        if mejoras == 0:
+            break
+
+    return etiquetas
+
+
+def refinar_df(df, columna="Dia", cantidades=None, k_vecinos=10, tiempo_max=2.0):
+    """
+    Refinamiento de la columna `columna` de un DataFrame.
+    - cantidades: puntos por grupo en el orden de las categorías (p. ej.
+      capacidades_por_dia); por defecto, o si no coinciden con la cantidad de
+      grupos, se conservan los tamaños actuales.
+    Devuelve una copia con la columna refinada (mismos valores de etiqueta).
+    """
+    codigos, categorias = codificar_etiquetas(df[columna])
+    if cantidades is not None and len(cantidades) != len(categorias):
+        cantidades = None
+    xy, _ = coordenadas_plano(df)
+    nuevos = refinar_asignacion(xy, codigos, cantidades, k_vecinos=k_vecinos, tiempo_max=tiempo_max)
+
+    df = df.copy()
+    cambiados = np.flatnonzero(nuevos != codigos)
+    if len(cambiados):
+        valores = pd.Index(categorias)[nuevos[cambiados]].astype(df[columna].dtype)  # p. ej. int16
+        df.iloc[cambiados, df.columns.get_loc(columna)] = valores
+    return df
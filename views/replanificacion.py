@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+from utils.distancias import centro_mas_cercano, coordenadas_plano, distancias_plano
+from utils.ingesta import cruzar_por_contrato
+from utils.metricas import codificar_etiquetas
+
+
+def cuotas_proporcionales(tamanos, total):
+    """
+    Reparte `total` puntos entre los grupos en proporción a sus tamanos previos
+    (restos mayores). Un plan balanceado sigue balanceado; uno editado a mano
+    conserva sus proporciones.
+    """
+    tamanos = np.asarray(tamanos, dtype=float)
+    if tamanos.sum() <= 0:
+        tamanos = np.ones(len(tamanos))
+    exactas = tamanos * total / tamanos.sum()
+    cuotas = np.floor(exactas).astype(np.int64)
+    faltan = int(total - cuotas.sum())
+    cuotas[np.argsort(-(exactas - cuotas), kind="stable")[:faltan]] += 1
+    return cuotas
+
+
+def _caminos_minimos(costos, origen):
+    """
+    Dijkstra denso sobre una matriz de costos k×k (k = grupos, pocos).
+    Devuelve (costo acumulado desde origen, predecesor de cada grupo; -1 = ninguno).
+    """
+    k = len(costos)
+    costo = np.full(k, np.inf)
+    previos = np.full(k, -1, dtype=np.int64)
+    visitado = np.zeros(k, dtype=bool)
+    costo[origen] = 0.0
+    for _ in range(k):
+        actual = int(np.argmin(np.where(visitado, np.inf, costo)))
+        if not np.isfinite(costo[actual]):
+            break
+        visitado[actual] = True
+        nuevo = costo[actual] + costos[actual]
+        mejora = ~visitado & (nuevo < costo)
+        costo[mejora] = nuevo[mejora]
+        previos[mejora] = actual
+    return costo, previos
+
+
+def reubicar_cambios(xy, etiquetas, cuotas):
+    """
+    Completa una asignación previa sin recalcularla:
+    - los puntos con etiqueta -1 (contratos nuevos) van al grupo de centro más cercano;
+    - luego se corrigen excesos y faltantes pasando puntos de frontera de grupo en
+      grupo por el camino más corto entre centros (un grupo con sobrante cede al
+      vecino, que cede al siguiente, hasta llegar al grupo con faltante).
+    Un punto conservado que no está en el grupo de centro más cercano (p. ej. una
+    edición manual en el mapa) solo se mueve si no queda otro candidato.
+    El trabajo depende de la cantidad de cambios y del tamaño de los grupos tocados,
+    no del total de puntos. Devuelve las etiquetas nuevas (int32).
+    """
+    xy = np.asarray(xy, dtype=float)
+    etiquetas = np.asarray(etiquetas, dtype=np.int32).copy()
+    cuotas = np.asarray(cuotas, dtype=np.int64)
+    k = len(cuotas)
+
+    asignados = etiquetas >= 0
+    conteos = np.bincount(etiquetas[asignados], minlength=k)
+    suma = np.column_stack([
+        np.bincount(etiquetas[asignados], weights=xy[asignados, e], minlength=k) for e in range(2)
+    ])
+    # Un grupo sin puntos conservados toma el centro de todos (solo para ubicarlo)
+    centro_general = xy[asignados].mean(axis=0) if asignados.any() else xy.mean(axis=0)
+
+    def centros_actuales():
+        return np.where(conteos[:, None] > 0, suma / np.maximum(conteos, 1)[:, None], centro_general)
+
+    centros = centros_actuales()
+
+    # 👉 Contratos nuevos: al centro más cercano
+    nuevos = np.flatnonzero(~asignados)
+    if len(nuevos):
+        destino, _ = centro_mas_cercano(xy[nuevos], centros)
+        etiquetas[nuevos] = destino
+        conteos += np.bincount(destino, minlength=k)
+        for e in range(2):
+            suma[:, e] += np.bincount(destino, weights=xy[nuevos, e], minlength=k)
+
+    orden = np.argsort(etiquetas, kind="stable")
+    miembros = np.split(orden, np.cumsum(conteos)[:-1])
+    exceso = conteos - cuotas
+
+    # 👉 Reequilibrio por cadenas: costo de cruzar entre grupos = distancia² entre centros
+    while (exceso > 0).any():
+        centros = centros_actuales()
+        origen = int(np.argmax(exceso))
+        costo_camino, previos = _caminos_minimos(distancias_plano(centros, centros, cuadrado=True), origen)
+        faltantes = np.flatnonzero(exceso < 0)
+        destino = int(faltantes[np.argmin(costo_camino[faltantes])])
+
+        camino = [destino]
+        while camino[-1] != origen:
+            camino.append(int(previos[camino[-1]]))
+        camino.reverse()
+        cantidad = int(min(exceso[origen], -exceso[destino], conteos[camino[:-1]].min()))
+        if cantidad == 0:
+            # Un grupo intermedio vacío no puede ceder: se pasa directo
+            camino = [origen, destino]
+            cantidad = int(min(exceso[origen], -exceso[destino]))
+
+        for a, b in zip(camino[:-1], camino[1:]):
+            puntos = miembros[a]
+            centros = centros_actuales()
+            cercano, _ = centro_mas_cercano(xy[puntos], centros)
+            ganancia = ((xy[puntos] - centros[b]) ** 2).sum(axis=1) - ((xy[puntos] - centros[a]) ** 2).sum(axis=1)
+            ganancia[asignados[puntos] & (cercano != a)] = np.inf
+            elegidos = np.argpartition(ganancia, cantidad - 1)[:cantidad] if cantidad < len(puntos) \
+                else np.arange(len(puntos))
+            movidos = puntos[elegidos]
+
+            etiquetas[movidos] = b
+            miembros[a] = np.delete(puntos, elegidos)
+            miembros[b] = np.concatenate([miembros[b], movidos])
+            desplazamiento = xy[movidos].sum(axis=0)
+            suma[a] -= desplazamiento
+            suma[b] += desplazamiento
+            conteos[a] -= len(movidos)
+            conteos[b] += len(movidos)
+
+        exceso[origen] -= cantidad
+        exceso[destino] += cantidad
+
+    return etiquetas
+
+
+def _replanificar_columna(xy, serie, previa):
+    """
+    Reubica una columna de asignación (Dia o Tecnico) de un grupo de filas.
+    - serie: etiquetas actuales (NaN = sin asignar); previa: etiquetas del plan previo,
+      de donde salen los grupos posibles y sus proporciones.
+    Devuelve la Serie completa con los mismos valores de etiqueta.
+    """
+    _, categorias = codificar_etiquetas(previa)
+    if not categorias:
+        return serie
+    indice = pd.Index(categorias)
+    codigos = indice.get_indexer(serie)
+    tamanos = previa.value_counts().reindex(indice, fill_value=0).to_numpy()
+
+    nuevos = reubicar_cambios(xy, codigos, cuotas_proporcionales(tamanos, len(serie)))
+    return pd.Series(indice[nuevos], index=serie.index)
+
+
+def replanificar_desde_plan(df, plan):
+    """
+    Plan incremental: el df del día se cruza por contrato con un plan previo
+    (ver utils.ingesta.leer_plan). Los contratos que siguen conservan su Dia y
+    Tecnico (incluidas las ediciones manuales guardadas), los nuevos se ubican en
+    el día/técnico más cercano y los días que perdieron o ganaron contratos se
+    reequilibran con sus vecinos.
+    Devuelve (df, resumen) con las cantidades de conservados, nuevos, eliminados y reubicados.
+    """
+    df, eliminados = cruzar_por_contrato(df, plan)
+    if "Orden" in df.columns:
+        del df["Orden"]  # 👉 el orden de visita del archivo no corresponde al plan nuevo
+    xy, _ = coordenadas_plano(df)
+    nuevo = df["Dia"].isna().to_numpy()
+    dia_previo = df["Dia"].copy()
+
+    df["Dia"] = _replanificar_columna(xy, df["Dia"], plan["Dia"])
+    cambio_dia = (df["Dia"] != dia_previo).to_numpy() & ~nuevo
+
+    if "Tecnico" in df.columns:
+        # Técnicos: solo en los días que ganaron o perdieron puntos
+        df.loc[cambio_dia, "Tecnico"] = np.nan
+        afectados = set(df.loc[df["Tecnico"].isna(), "Dia"]) | set(eliminados["Dia"].dropna())
+        for dia in afectados:
+            filas = np.flatnonzero((df["Dia"] == dia).to_numpy())
+            previa = plan.loc[plan["Dia"] == dia, "Tecnico"].dropna()
+            if len(filas) and len(previa):
+                columna = df.columns.get_loc("Tecnico")
+                df.iloc[filas, columna] = _replanificar_columna(
+                    xy[filas], df["Tecnico"].iloc[filas], previa
+                ).to_numpy()
+        if df["Tecnico"].notna().all():
+            df["Tecnico"] = df["Tecnico"].astype(plan["Tecnico"].dtype)
+
+    resumen = {
+        "conservados": int((~nuevo).sum()),
+        "nuevos": int(nuevo.sum()),
+        "eliminados": len(eliminados),
+        "reubicados": int(cambio_dia.sum()),
+    }
+    return df, resumen
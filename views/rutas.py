@@ -0,0 +1,199 @@
+import math
+import time
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from utils.distancias import coordenadas_plano
+
+_EPS = 1e-7
+
+
+def _construir_vecino_mas_cercano(xy, vecinos):
+    """
+    Ruta inicial: desde el punto más alejado del centro, siempre al punto libre
+    más cercano. Se busca primero en la lista de vecinos; solo si todos están
+    visitados se recorre el resto de puntos.
+    """
+    n = len(xy)
+    libre = np.ones(n, dtype=bool)
+    actual = int(np.argmax(((xy - xy.mean(axis=0)) ** 2).sum(axis=1)))
+    ruta = [actual]
+    libre[actual] = False
+    for _ in range(n - 1):
+        siguiente = next((c for c in vecinos[actual] if libre[c]), None)
+        if siguiente is None:
+            restantes = np.flatnonzero(libre)
+            dist = ((xy[restantes] - xy[actual]) ** 2).sum(axis=1)
+            siguiente = int(restantes[dist.argmin()])
+        actual = siguiente
+        ruta.append(actual)
+        libre[actual] = False
+    return ruta
+
+
+def secuenciar_ruta(xy, k_vecinos=8, tiempo_max=1.0):
+    """
+    Orden de visita (recorrido abierto) para puntos en coordenadas métricas.
+    - Construcción por vecino más cercano.
+    - Mejora 2-opt y Or-opt (segmentos de 1 a 3 puntos) evaluando solo los
+      k vecinos más cercanos de cada punto: memoria O(n·k), sin matriz completa.
+      Una cola de puntos "activos" evita revisar zonas que ya no mejoran.
+    - tiempo_max: segundos de mejora como máximo.
+    Devuelve un arreglo con los índices de los puntos en orden de visita.
+    """
+    xy = np.asarray(xy, dtype=float)
+    n = len(xy)
+    if n <= 3:
+        return np.arange(n)
+
+    limite = time.perf_counter() + tiempo_max
+    vecinos = KDTree(xy).query(xy, k=min(k_vecinos + 1, n), return_distance=False)[:, 1:].tolist()
+    ruta = _construir_vecino_mas_cercano(xy, vecinos)
+    X, Y = xy[:, 0].tolist(), xy[:, 1].tolist()
+    hypot = math.hypot
+    pos = [0] * n
+    for i, p in enumerate(ruta):
+        pos[p] = i
+
+    def d(a, b):
+        if a < 0 or b < 0:
+            return 0.0
+        return hypot(X[a] - X[b], Y[a] - Y[b])
+
+    def en(i):
+        # -1 marca "fuera de la ruta" (extremos del recorrido abierto)
+        return ruta[i] if 0 <= i < n else -1
+
+    def invertir(i, j):
+        ruta[i + 1:j + 1] = ruta[i + 1:j + 1][::-1]
+        for k in range(i + 1, j + 1):
+            pos[ruta[k]] = k
+
+    def dos_opt(a):
+        """Primera mejora 2-opt que crea una arista entre a y uno de sus vecinos."""
+        for c in vecinos[a]:
+            p, q = sorted((pos[a], pos[c]))
+            # Invertir ruta[i+1..j] quita (i, i+1), (j, j+1) y crea (i, j), (i+1, j+1)
+            for i, j in ((p, q), (p - 1, q - 1)):
+                if j - i < 2:
+                    continue
+                ri, ri1, rj, rj1 = en(i), en(i + 1), en(j), en(j + 1)
+                if d(ri, ri1) + d(rj, rj1) - d(ri, rj) - d(ri1, rj1) > _EPS:
+                    invertir(i, j)
+                    return (ri, ri1, rj, rj1)
+        return None
+
+    def or_opt(a):
+        """Mueve el segmento de 1 a 3 puntos que empieza en a junto a un vecino."""
+        nonlocal ruta
+        for largo in (1, 2, 3):
+            i = pos[a]
+            if i + largo > n:
+                return None
+            segmento = ruta[i:i + largo]
+            s0, s1 = segmento[0], segmento[-1]
+            previo, siguiente = en(i - 1), en(i + largo)
+            quitar = d(previo, s0) + d(s1, siguiente) - d(previo, siguiente)
+            if quitar <= _EPS:
+                continue
+
+            mejor = None
+            for c in set(vecinos[s0]) | set(vecinos[s1]):
+                if c in segmento:
+                    continue
+                pc = pos[c]
+                for u, v in ((c, en(pc + 1)), (en(pc - 1), c)):
+                    if u in segmento or v in segmento:
+                        continue
+                    base = d(u, v)
+                    for invertido, costo in (
+                        (False, d(u, s0) + d(s1, v) - base),
+                        (True, d(u, s1) + d(s0, v) - base),
+                    ):
+                        if quitar - costo > _EPS and (mejor is None or quitar - costo > mejor[0]):
+                            mejor = (quitar - costo, u, v, invertido)
+
+            if mejor is not None:
+                _, u, v, invertido = mejor
+                resto = ruta[:i] + ruta[i + largo:]
+                insertar = resto.index(u) + 1 if u >= 0 else 0
+                ruta = resto[:insertar] + (segmento[::-1] if invertido else segmento) + resto[insertar:]
+                for k, p in enumerate(ruta):
+                    pos[p] = k
+                return (previo, siguiente, u, v, s0, s1)
+        return None
+
+    activos = list(range(n))
+    en_cola = [True] * n
+    while activos and time.perf_counter() < limite:
+        a = activos.pop()
+        en_cola[a] = False
+        tocados = dos_opt(a) or or_opt(a)
+        if tocados:
+            for t in (a,) + tocados:
+                if t >= 0 and not en_cola[t]:
+                    en_cola[t] = True
+                    activos.append(t)
+
+    return np.asarray(ruta)
+
+
+def longitud_ruta(xy, orden):
+    """Largo del recorrido abierto (en las unidades de xy)."""
+    tramo = np.diff(np.asarray(xy)[orden], axis=0)
+    return float(np.hypot(tramo[:, 0], tramo[:, 1]).sum())
+
+
+def secuenciar_grupos(df, columna, grupos=None, k_vecinos=8, tiempo_max=1.0):
+    """
+    Agrega/actualiza la columna 'Orden' (1..n) con el orden de visita dentro de
+    cada valor de `columna` (día o técnico).
+    - grupos: si se indica, solo se recalculan esos grupos; el resto conserva su orden.
+    """
+    df = df.copy()
+    if "Orden" not in df.columns:
+        df["Orden"] = 0
+        grupos = None
+
+    xy, _ = coordenadas_plano(df)
+    orden = df["Orden"].to_numpy().copy()
+    for valor, posiciones in df.groupby(columna, sort=False).indices.items():
+        if grupos is not None and valor not in grupos:
+            continue
+        secuencia = secuenciar_ruta(xy[posiciones], k_vecinos=k_vecinos, tiempo_max=tiempo_max)
+        orden[posiciones[secuencia]] = np.arange(1, len(posiciones) + 1)
+
+    df["Orden"] = orden
+    return df
+
+
+def invalidar_orden(df, filas=None):
+    """
+    Descarta el orden de visita de puntos cuyas etiquetas se reescribieron (su
+    ruta ya no corresponde al grupo y no se dibuja ni se exporta).
+    - filas: sin indicar se quita la columna 'Orden' (copia superficial); si se
+      indican, esas filas quedan con Orden 0 en el mismo df.
+    Devuelve df.
+    """
+    if "Orden" not in df.columns:
+        return df
+    if filas is None:
+        df = df.copy(deep=False)
+        del df["Orden"]
+    else:
+        df.loc[filas, "Orden"] = 0
+    return df
+
+
+def grupos_cambiados(df, columna, previo):
+    """
+    Grupos de `columna` cuyo contenido cambió respecto a `previo` (las etiquetas
+    de la última secuenciación) o que tienen puntos sin orden (Orden 0, ver
+    invalidar_orden). None = hay que recalcular todos.
+    """
+    if previo is None or "Orden" not in df.columns or not previo.index.equals(df.index):
+        return None
+    cambiados = df[columna].ne(previo)
+    sin_orden = ~(df["Orden"] > 0)
+    return set(df.loc[cambiados | sin_orden, columna].dropna()) | set(previo[cambiados].dropna())